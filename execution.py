@@ -2,35 +2,181 @@ import os
 import sys
 import json
 import time
+import queue
+import pickle
+import hashlib
+import logging
+import atexit
 import argparse
+import functools
+import threading
+from concurrent.futures import Future
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, Any
 
 # Add utils to path
 sys.path.append(str(Path(__file__).parent / "utils"))
 
-from preprocessing import preprocess_image
-from ocr_module import OCRExtractor
-from vlm_module import VLMExtractor
-from detection_module import SignatureStampDetector
-from field_extractors import FieldExtractor
-from validation import Validator
-from output_formatter import OutputFormatter
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_MODULES_LOADED = False
+
+
+def _load_pipeline_modules():
+    """
+    Import the heavy pipeline modules on first use
+
+    The OCR/VLM/detection modules drag in PaddleOCR, Transformers, and
+    Ultralytics (tens of seconds of import time), so they are deferred
+    until a pipeline is actually constructed. `--help` and argument
+    errors then return instantly.
+    """
+    global _MODULES_LOADED, preprocess_image, OCRExtractor, VLMExtractor
+    global SignatureStampDetector, FieldExtractor, Validator, OutputFormatter, BatchQueue
+
+    if _MODULES_LOADED:
+        return
+
+    import preprocessing
+    import ocr_module
+    import vlm_module
+    import detection_module
+    import field_extractors
+    import validation
+    import output_formatter
+    import batch_queue
+
+    preprocess_image = preprocessing.preprocess_image
+    OCRExtractor = ocr_module.OCRExtractor
+    VLMExtractor = vlm_module.VLMExtractor
+    SignatureStampDetector = detection_module.SignatureStampDetector
+    FieldExtractor = field_extractors.FieldExtractor
+    Validator = validation.Validator
+    OutputFormatter = output_formatter.OutputFormatter
+    BatchQueue = batch_queue.BatchQueue
+
+    _MODULES_LOADED = True
+
+logger = logging.getLogger(__name__)
+
+# Bounded queue size between pipeline stages (documents in flight per stage)
+STAGE_QUEUE_SIZE = 4
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.pdf', '.tiff', '.bmp'}
+
+# Immutable default configuration, shared without copying across pipeline
+# instances (and across forked worker processes)
+_DEFAULT_CONFIG = MappingProxyType({
+    "fuzzy_match_threshold": 90,
+    "confidence_threshold": 0.5,
+    "dealer_master_path": "data/dealer_master.txt",
+    "asset_master_path": "data/asset_master.txt",
+    "vlm_max_batch_size": 4,
+    "vlm_max_wait_time": 0.1,
+    "max_concurrent_vlm_batches": 1,
+    "vlm_skip_threshold": 0.85,
+    "vlm_compile": False
+})
+
+
+@functools.lru_cache(maxsize=4)
+def _load_config(config_path: str):
+    """
+    Load and cache a configuration file
+
+    Parsed once per path per process, so repeated pipeline constructions
+    (e.g. worker re-init) don't re-stat and re-parse the JSON.
+    """
+    if os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            return json.load(f)
+    return _DEFAULT_CONFIG
+
+
+def list_image_files(input_dir: str) -> list:
+    """
+    List supported image files in a directory with one scandir pass
+
+    A single scan with a case-insensitive suffix check replaces the
+    per-extension (and per-case) glob calls, which each re-walked the
+    directory.
+
+    Args:
+        input_dir: Directory containing invoice images
+
+    Returns:
+        Sorted list of image file paths
+    """
+    files = [
+        Path(entry.path) for entry in os.scandir(input_dir)
+        if entry.is_file() and Path(entry.name).suffix.lower() in IMAGE_EXTENSIONS
+    ]
+    files.sort()
+    return files
+
+
+def write_json(path, obj):
+    """Serialize one result to disk, preferring orjson when installed"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(obj, f, indent=2)
+
+
+def _json_writer_loop(write_q: queue.Queue):
+    """
+    Drain (path, result) items from the queue and write them to disk
+
+    Runs on a background thread so disk latency never stalls inference;
+    a None sentinel terminates the loop.
+    """
+    while True:
+        item = write_q.get()
+        if item is None:
+            return
+        path, obj = item
+        try:
+            write_json(path, obj)
+        except Exception:
+            logger.exception("Failed writing %s", path)
 
 
 class DocumentAIPipeline:
     """End-to-end pipeline for invoice field extraction"""
     
-    def __init__(self, config_path: str = "config.json"):
-        """Initialize pipeline with configuration"""
+    def __init__(self, config_path: str = "config.json", use_cache: bool = True):
+        """
+        Initialize pipeline with configuration
+
+        Args:
+            config_path: Path to JSON configuration file
+            use_cache: Reuse cached per-stage results for images already
+                processed in a previous run
+        """
+        _load_pipeline_modules()
+
         self.load_config(config_path)
-        
+
+        self.use_cache = use_cache
+        self.cache_dir = Path(self.config.get(
+            "cache_dir", Path.home() / ".cache" / "convolve"
+        ))
+
         # Initialize modules
         print("Initializing OCR module...")
         self.ocr_extractor = OCRExtractor()
         
         print("Initializing VLM module...")
-        self.vlm_extractor = VLMExtractor()
+        self.vlm_extractor = VLMExtractor(
+            compile_model=self.config.get('vlm_compile', False)
+        )
         
         print("Initializing detection module...")
         self.detector = SignatureStampDetector()
@@ -43,23 +189,124 @@ class DocumentAIPipeline:
         
         print("Initializing validator...")
         self.validator = Validator()
+
+        # Aggregates per-document VLM calls into mini-batches in batch mode
+        self.vlm_batcher = BatchQueue(
+            self.vlm_extractor.extract_batch,
+            max_batch_size=self.config.get("vlm_max_batch_size", 4),
+            max_wait_time=self.config.get("vlm_max_wait_time", 0.1),
+            max_concurrent_batches=self.config.get("max_concurrent_vlm_batches", 1),
+            # Batch only similarly-sized images together so small ones are
+            # not padded up to the largest in the batch
+            bucket_fn=lambda img: (round(img.shape[0] / 64), round(img.shape[1] / 64))
+        )
         
         print("Pipeline initialized successfully!")
     
     def load_config(self, config_path: str):
-        """Load configuration from JSON file"""
-        if os.path.exists(config_path):
-            with open(config_path, 'r') as f:
-                self.config = json.load(f)
-        else:
-            # Default configuration
-            self.config = {
-                "fuzzy_match_threshold": 90,
-                "confidence_threshold": 0.5,
-                "dealer_master_path": "data/dealer_master.txt",
-                "asset_master_path": "data/asset_master.txt"
-            }
+        """Load configuration from JSON file (cached per path)"""
+        self.config = _load_config(config_path)
     
+    @staticmethod
+    def _content_key(image_path: str) -> str:
+        """Content hash of the raw image file, used as the cache key"""
+        with open(image_path, 'rb') as f:
+            return hashlib.blake2b(f.read()).hexdigest()
+
+    def _cache_get(self, stage_name: str, key: str):
+        """Return a cached stage result, or None on a miss"""
+        if not self.use_cache or key is None:
+            return None
+        cache_path = self.cache_dir / stage_name / f"{key}.pkl"
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            # EOFError: truncated/empty file left by an interrupted run
+            return None
+
+    def _cache_put(self, stage_name: str, key: str, result):
+        """Store a stage result in the cache; failures are non-fatal"""
+        if not self.use_cache or key is None:
+            return
+        cache_path = self.cache_dir / stage_name / f"{key}.pkl"
+        # Write to a temp file and rename so a killed run never leaves a
+        # half-written pickle at the final path (the rename is atomic)
+        tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f)
+            os.replace(tmp_path, cache_path)
+        except (OSError, pickle.PickleError):
+            pass
+
+    def _is_cacheable(self, stage_name: str, result) -> bool:
+        """
+        True when a stage result is worth persisting
+
+        The extractors degrade gracefully — OCR returns an empty result
+        when PaddleOCR is missing or throws, and the VLM returns its
+        fallback dict on any error. Persisting those would turn a
+        transient failure into a permanent cache hit, so they are
+        recomputed on the next run instead.
+        """
+        if result is None:
+            return False
+        if stage_name == 'vlm':
+            return result.get('vlm_available', True)
+        if stage_name == 'ocr':
+            # Successful extractions carry num_lines; the fallback doesn't
+            return 'num_lines' in result
+        return True
+
+    def _cached(self, stage_name: str, key: str, fn, *args):
+        """
+        Run a heavy stage through the content-addressed cache
+
+        On a warm hit the stage becomes a disk read; the model never runs.
+
+        Args:
+            stage_name: Cache namespace (one per pipeline stage)
+            key: Content hash of the source image
+            fn: Stage function to call on a miss
+            *args: Arguments passed to fn
+
+        Returns:
+            The stage result, cached or freshly computed
+        """
+        result = self._cache_get(stage_name, key)
+        if result is not None:
+            return result
+
+        result = fn(*args)
+        if self._is_cacheable(stage_name, result):
+            self._cache_put(stage_name, key, result)
+        return result
+
+    def _try_ocr_only_extract(self, ocr_result, detection_result):
+        """
+        Attempt extraction from OCR alone (VLM cascade early exit)
+
+        Returns the extracted fields when every text field clears the
+        configured vlm_skip_threshold, or None when the VLM is still needed.
+        """
+        fields = self.field_extractor.extract_all_fields(
+            ocr_result=ocr_result,
+            vlm_result=None,
+            detection_result=detection_result
+        )
+
+        threshold = self.config.get('vlm_skip_threshold', 0.85)
+        confidences = [
+            fields[name].confidence
+            for name in ('dealer_name', 'model_name', 'horse_power', 'asset_cost')
+        ]
+
+        if min(confidences) >= threshold:
+            return fields
+        return None
+
     def process_document(self, image_path: str) -> Dict[str, Any]:
         """
         Process a single document and extract fields
@@ -71,33 +318,43 @@ class DocumentAIPipeline:
             Dictionary containing extracted fields and metadata
         """
         start_time = time.time()
-        
+
         print(f"\nProcessing: {image_path}")
-        
+
+        # Content hash keys the per-stage cache; re-runs on the same bytes
+        # skip straight to the stored results
+        key = self._content_key(image_path) if self.use_cache else None
+
         # Step 1: Preprocess image
         print("  [1/6] Preprocessing image...")
-        preprocessed_img = preprocess_image(image_path)
-        
+        preprocessed_img = self._cached('preprocess', key, preprocess_image, image_path)
+
         # Step 2: OCR extraction
         print("  [2/6] Extracting text with OCR...")
-        ocr_result = self.ocr_extractor.extract(preprocessed_img)
-        
-        # Step 3: VLM extraction
-        print("  [3/6] Analyzing with Vision-Language Model...")
-        vlm_result = self.vlm_extractor.extract(preprocessed_img)
-        
-        # Step 4: Signature and stamp detection
-        print("  [4/6] Detecting signatures and stamps...")
-        detection_result = self.detector.detect(preprocessed_img)
-        
-        # Step 5: Field extraction
-        print("  [5/6] Extracting and matching fields...")
-        fields = self.field_extractor.extract_all_fields(
-            ocr_result=ocr_result,
-            vlm_result=vlm_result,
-            detection_result=detection_result
-        )
-        
+        ocr_result = self._cached('ocr', key, self.ocr_extractor.extract, preprocessed_img)
+
+        # Step 3: Signature and stamp detection (before the VLM so the
+        # cascade below can decide whether the VLM is needed at all)
+        print("  [3/6] Detecting signatures and stamps...")
+        detection_result = self._cached('detection', key, self.detector.detect, preprocessed_img)
+
+        # Step 4: VLM extraction, skipped when OCR already covers every
+        # text field confidently
+        fields = self._try_ocr_only_extract(ocr_result, detection_result)
+        if fields is not None:
+            print("  [4/6] OCR is confident; skipping Vision-Language Model")
+        else:
+            print("  [4/6] Analyzing with Vision-Language Model...")
+            vlm_result = self._cached('vlm', key, self.vlm_extractor.extract, preprocessed_img)
+
+            # Step 5: Field extraction
+            print("  [5/6] Extracting and matching fields...")
+            fields = self.field_extractor.extract_all_fields(
+                ocr_result=ocr_result,
+                vlm_result=vlm_result,
+                detection_result=detection_result
+            )
+
         # Step 6: Validation
         print("  [6/6] Validating and formatting output...")
         validated_fields = self.validator.validate(fields)
@@ -134,58 +391,182 @@ class DocumentAIPipeline:
         # Assuming CPU inference at ~0.0003 USD per second (very conservative estimate)
         return processing_time * 0.0003
     
+    def _preprocess_stage(self, image_files, out_q: queue.Queue):
+        """
+        Stage 1: read images from disk and preprocess them
+
+        Pushes (path, cache_key, preprocessed_image, start_time) tuples; a
+        None sentinel signals the downstream stage to terminate.
+        """
+        for image_path in image_files:
+            try:
+                start_time = time.time()
+                key = self._content_key(str(image_path)) if self.use_cache else None
+                img = self._cached('preprocess', key, preprocess_image, str(image_path))
+                out_q.put((image_path, key, img, start_time))
+            except Exception:
+                logger.exception("Preprocessing failed for %s", image_path.name)
+        out_q.put(None)
+
+    def _ocr_detection_stage(self, in_q: queue.Queue, out_q: queue.Queue):
+        """
+        Stage 2: run OCR and signature/stamp detection
+
+        OCR and detection don't contend for the same device, so they run
+        back-to-back here while the VLM stage works on the previous document.
+        """
+        while True:
+            item = in_q.get()
+            if item is None:
+                out_q.put(None)
+                break
+
+            image_path, key, img, start_time = item
+            try:
+                ocr_result = self._cached('ocr', key, self.ocr_extractor.extract, img)
+                detection_result = self._cached('detection', key, self.detector.detect, img)
+                out_q.put((image_path, key, img, start_time, ocr_result, detection_result))
+            except Exception:
+                logger.exception("OCR/detection failed for %s", image_path.name)
+
+    def _vlm_output_stage(self, in_q: queue.Queue, output_dir: str, results: list,
+                          write_q: queue.Queue):
+        """
+        Stage 3: VLM extraction, field matching, validation, and JSON output
+
+        Documents are submitted to the VLM batch queue as soon as they arrive
+        so the batcher can group them; completed ones are finalized in order.
+        """
+        pending = []
+
+        while True:
+            item = in_q.get()
+            if item is None:
+                break
+
+            # An escaped exception would kill this consumer thread and,
+            # with bounded queues upstream, deadlock the whole pipeline —
+            # log and move on like the other stages
+            try:
+                # Cached VLM results bypass the batcher entirely, and docs
+                # where OCR alone is already confident skip the VLM outright
+                cached_vlm = self._cache_get('vlm', item[1])
+                if cached_vlm is not None:
+                    future = Future()
+                    future.set_result(cached_vlm)
+                elif self._try_ocr_only_extract(item[4], item[5]) is not None:
+                    future = Future()
+                    future.set_result(None)
+                else:
+                    future = self.vlm_batcher.submit(item[2])
+                pending.append((item, future))
+            except Exception:
+                logger.exception("VLM stage failed for %s", item[0].name)
+                continue
+
+            # Finalize whatever has already completed, keeping memory bounded
+            while pending and pending[0][1].done():
+                self._finalize_document(*pending.pop(0), output_dir=output_dir,
+                                        results=results, write_q=write_q)
+
+        for item, future in pending:
+            self._finalize_document(item, future, output_dir=output_dir,
+                                    results=results, write_q=write_q)
+
+    def _finalize_document(self, item, vlm_future, output_dir: str, results: list,
+                           write_q: queue.Queue):
+        """Run field extraction, validation, and output once VLM is done"""
+        image_path, key, img, start_time, ocr_result, detection_result = item
+        try:
+            vlm_result = vlm_future.result()
+            if self._is_cacheable('vlm', vlm_result):
+                self._cache_put('vlm', key, vlm_result)
+
+            fields = self.field_extractor.extract_all_fields(
+                ocr_result=ocr_result,
+                vlm_result=vlm_result,
+                detection_result=detection_result
+            )
+            validated_fields = self.validator.validate(fields)
+
+            processing_time = time.time() - start_time
+            estimated_cost = self.estimate_cost(processing_time)
+
+            output = OutputFormatter.format(
+                doc_id=Path(image_path).stem,
+                fields=validated_fields,
+                processing_time=processing_time,
+                estimated_cost=estimated_cost
+            )
+
+            # Hand the write to the background writer; inference keeps going
+            output_path = Path(output_dir) / f"{output['doc_id']}.json"
+            write_q.put((output_path, output))
+
+            results.append(output)
+            logger.info("Completed %s in %.2fs", image_path.name, processing_time)
+        except Exception:
+            logger.exception("Extraction failed for %s", image_path.name)
+
     def process_batch(self, input_dir: str, output_dir: str):
         """
-        Process a batch of documents
-        
+        Process a batch of documents with a 3-stage threaded pipeline
+
+        Stages (I/O+preprocess, OCR+detection, VLM+output) are connected by
+        bounded queues so that while document N is in the VLM, document N+1
+        is in OCR and document N+2 is being preprocessed. Throughput then
+        approaches max(stage_time) instead of sum(stage_time).
+
         Args:
             input_dir: Directory containing invoice images
             output_dir: Directory to save output JSON files
         """
         os.makedirs(output_dir, exist_ok=True)
-        
-        # Get all image files
-        image_extensions = ['.jpg', '.jpeg', '.png', '.pdf', '.tiff', '.bmp']
-        image_files = []
-        for ext in image_extensions:
-            image_files.extend(Path(input_dir).glob(f'*{ext}'))
-            image_files.extend(Path(input_dir).glob(f'*{ext.upper()}'))
-        
+
+        image_files = list_image_files(input_dir)
+
         print(f"\nFound {len(image_files)} documents to process")
-        
+
         results = []
-        total_time = 0
-        total_cost = 0
-        
-        for i, image_path in enumerate(image_files, 1):
-            print(f"\n{'='*60}")
-            print(f"Document {i}/{len(image_files)}")
-            print(f"{'='*60}")
-            
-            try:
-                result = self.process_document(str(image_path))
-                results.append(result)
-                
-                total_time += result['processing_time_seconds']
-                total_cost += result['estimated_cost_usd']
-                
-                # Save individual result
-                output_path = Path(output_dir) / f"{result['doc_id']}.json"
-                with open(output_path, 'w') as f:
-                    json.dump(result, f, indent=2)
-                    
-            except Exception as e:
-                print(f"  ✗ Error processing {image_path.name}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-        
+
+        preproc_q = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+        ocr_q = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+        write_q = queue.Queue()
+
+        writer_thread = threading.Thread(target=_json_writer_loop,
+                                         args=(write_q,), daemon=True)
+        threads = [
+            threading.Thread(target=self._preprocess_stage,
+                             args=(image_files, preproc_q), daemon=True),
+            threading.Thread(target=self._ocr_detection_stage,
+                             args=(preproc_q, ocr_q), daemon=True),
+            threading.Thread(target=self._vlm_output_stage,
+                             args=(ocr_q, output_dir, results, write_q), daemon=True),
+        ]
+
+        batch_start = time.time()
+        writer_thread.start()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # Flush any queued writes before reporting
+        write_q.put(None)
+        writer_thread.join()
+
+        total_time = sum(r['processing_time_seconds'] for r in results)
+        total_cost = sum(r['estimated_cost_usd'] for r in results)
+
         # Print summary
+        wall_time = time.time() - batch_start
         print(f"\n{'='*60}")
         print("BATCH PROCESSING SUMMARY")
         print(f"{'='*60}")
         print(f"Total documents: {len(image_files)}")
         print(f"Successfully processed: {len(results)}")
         print(f"Failed: {len(image_files) - len(results)}")
+        print(f"Wall time: {wall_time:.2f}s")
         print(f"Total time: {total_time:.2f}s")
         print(f"Average time per document: {total_time/len(results):.2f}s")
         print(f"Total estimated cost: ${total_cost:.4f}")
@@ -193,34 +574,172 @@ class DocumentAIPipeline:
         print(f"{'='*60}\n")
 
 
+# Per-process pipeline instance for parallel batch mode; each worker loads
+# its models once on first use and reuses them for every document
+_worker_pipeline = None
+
+
+def _init_worker_logging():
+    """
+    Configure plain stderr logging inside a pool worker
+
+    The parent's queue-based logging does not survive the fork: workers
+    inherit the root logger's QueueHandler but the listener thread that
+    drains the queue only runs in the parent, so per-document failure
+    logs would vanish. force=True drops the inherited handler and
+    installs a synchronous stderr one (fine here — workers log rarely).
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s %(message)s',
+        force=True
+    )
+
+
+def _process_document_worker(args) -> Dict[str, Any]:
+    """
+    Process one document inside a worker process
+
+    Args:
+        args: Tuple of (image_path, config_path, output_dir)
+
+    Returns:
+        Formatted output dictionary for the document, or None if it
+        failed (one corrupt image must not abort the whole batch)
+    """
+    global _worker_pipeline
+
+    image_path, config_path, output_dir, use_cache = args
+
+    if _worker_pipeline is None:
+        _worker_pipeline = DocumentAIPipeline(config_path=config_path, use_cache=use_cache)
+
+    try:
+        result = _worker_pipeline.process_document(str(image_path))
+
+        output_path = Path(output_dir) / f"{result['doc_id']}.json"
+        write_json(output_path, result)
+
+        return result
+    except Exception:
+        logger.exception("Processing failed for %s", Path(image_path).name)
+        return None
+
+
+def process_batch_parallel(input_dir: str, output_dir: str, config_path: str,
+                           max_workers: int, use_cache: bool = True):
+    """
+    Process a batch of documents across multiple worker processes
+
+    Each worker owns its own pipeline instance (models loaded once per
+    worker), giving near-linear speedup up to the core count as long as
+    the models fit in memory.
+
+    Args:
+        input_dir: Directory containing invoice images
+        output_dir: Directory to save output JSON files
+        config_path: Configuration file path passed to each worker
+        max_workers: Number of worker processes
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    image_files = list_image_files(input_dir)
+
+    max_workers = min(max_workers, os.cpu_count() or 1)
+    print(f"\nFound {len(image_files)} documents to process with {max_workers} workers")
+
+    work_items = [(path, config_path, output_dir, use_cache) for path in image_files]
+    results = []
+
+    batch_start = time.time()
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_init_worker_logging) as executor:
+        for result in executor.map(_process_document_worker, work_items, chunksize=1):
+            if result is not None:
+                results.append(result)
+
+    wall_time = time.time() - batch_start
+    total_time = sum(r['processing_time_seconds'] for r in results)
+    total_cost = sum(r['estimated_cost_usd'] for r in results)
+
+    print(f"\n{'='*60}")
+    print("BATCH PROCESSING SUMMARY")
+    print(f"{'='*60}")
+    print(f"Total documents: {len(image_files)}")
+    print(f"Successfully processed: {len(results)}")
+    print(f"Failed: {len(image_files) - len(results)}")
+    print(f"Wall time: {wall_time:.2f}s")
+    print(f"Total time: {total_time:.2f}s")
+    print(f"Average time per document: {total_time/max(len(results), 1):.2f}s")
+    print(f"Total estimated cost: ${total_cost:.4f}")
+    print(f"Average cost per document: ${total_cost/max(len(results), 1):.6f}")
+    print(f"{'='*60}\n")
+
+
+def _setup_logging():
+    """
+    Configure logging through a queue handler/listener pair
+
+    Pipeline threads only enqueue records; formatting and the actual
+    stderr writes happen on the listener's background thread, keeping
+    synchronous I/O off the processing path.
+    """
+    log_q = queue.Queue()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+    )
+
+    listener = QueueListener(log_q, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(log_q))
+
+
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description="Document AI Invoice Field Extraction")
     parser.add_argument('--input', type=str, required=True, help='Input image file or directory')
     parser.add_argument('--output', type=str, required=True, help='Output JSON file or directory')
     parser.add_argument('--config', type=str, default='config.json', help='Configuration file path')
-    
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes for batch mode (default: 1)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Disable the content-addressed stage result cache')
+
     args = parser.parse_args()
-    
-    # Initialize pipeline
-    pipeline = DocumentAIPipeline(config_path=args.config)
-    
+
+    _setup_logging()
+
+    use_cache = not args.no_cache
+
     # Check if input is a file or directory
     if os.path.isfile(args.input):
         # Process single document
+        pipeline = DocumentAIPipeline(config_path=args.config, use_cache=use_cache)
         result = pipeline.process_document(args.input)
-        
+
         # Save output
         os.makedirs(os.path.dirname(args.output), exist_ok=True)
-        with open(args.output, 'w') as f:
-            json.dump(result, f, indent=2)
-        
+        write_json(args.output, result)
+
         print(f"\nOutput saved to: {args.output}")
-        
+
     elif os.path.isdir(args.input):
         # Process batch
-        pipeline.process_batch(args.input, args.output)
-        
+        if args.workers > 1:
+            process_batch_parallel(args.input, args.output, args.config,
+                                   args.workers, use_cache=use_cache)
+        else:
+            pipeline = DocumentAIPipeline(config_path=args.config, use_cache=use_cache)
+            pipeline.process_batch(args.input, args.output)
+
     else:
         print(f"Error: Input path '{args.input}' does not exist")
         sys.exit(1)
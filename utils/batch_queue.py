@@ -0,0 +1,137 @@
+"""
+Mini-batching aggregator for model inference
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+# Internal marker for a queue.get timeout in the worker loop
+_TIMEOUT = object()
+
+
+class BatchQueue:
+    """
+    Aggregate single requests into mini-batches for a batched inference function
+
+    Callers submit items from pipeline threads and get a Future back. A
+    background worker fires a batch when either the queue reaches
+    max_batch_size or the oldest request has waited max_wait_time seconds,
+    so throughput improves under load without adding latency when idle.
+
+    When a bucket_fn is given, items are grouped by its key (e.g. image
+    resolution) and batches are formed only within a bucket, so small items
+    are never padded up to the largest item in a mixed batch.
+    """
+
+    def __init__(
+        self,
+        process_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 4,
+        max_wait_time: float = 0.1,
+        max_concurrent_batches: int = 1,
+        bucket_fn: Optional[Callable[[Any], Any]] = None
+    ):
+        """
+        Initialize batch queue
+
+        Args:
+            process_fn: Function taking a list of items and returning a list
+                of results in the same order
+            max_batch_size: Fire a batch as soon as this many items are queued
+            max_wait_time: Fire a partial batch once the oldest item has
+                waited this long (seconds)
+            max_concurrent_batches: Cap on batches in flight at once
+                (protects GPU memory when process_fn runs on an accelerator)
+            bucket_fn: Optional key function; items with different keys are
+                never batched together
+        """
+        self.process_fn = process_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self.bucket_fn = bucket_fn if bucket_fn is not None else (lambda item: None)
+
+        self._queue = queue.Queue()
+        # Batches run on this pool, not on the collector thread: the pool
+        # size enforces max_concurrent_batches, and a slow process_fn no
+        # longer stalls the time-based flush of the other buckets
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent_batches)
+        self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Submit a single item for batched processing
+
+        Args:
+            item: Input to pass to process_fn as part of a batch
+
+        Returns:
+            Future resolving to the item's result
+        """
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def close(self):
+        """Flush any queued items, wait for in-flight batches, and stop"""
+        self._queue.put(None)
+        self._worker.join()
+        self._pool.shutdown(wait=True)
+
+    def _worker_loop(self):
+        """Collect items into per-bucket batches and dispatch them to process_fn"""
+        buckets = {}  # bucket key -> list of (item, future, enqueue_time)
+
+        while True:
+            # Sleep no longer than the oldest queued item can still wait
+            if buckets:
+                oldest = min(entry[2] for batch in buckets.values() for entry in batch)
+                timeout = max(0.0, oldest + self.max_wait_time - time.time())
+            else:
+                timeout = None
+
+            try:
+                head = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                head = _TIMEOUT
+
+            if head is None:
+                for key in list(buckets):
+                    self._dispatch(buckets.pop(key))
+                return
+
+            if head is not _TIMEOUT:
+                item, future = head
+                key = self.bucket_fn(item)
+                buckets.setdefault(key, []).append((item, future, time.time()))
+
+                if len(buckets[key]) >= self.max_batch_size:
+                    self._dispatch(buckets.pop(key))
+                    continue
+
+            # Flush any bucket whose oldest item has waited long enough
+            now = time.time()
+            for key in list(buckets):
+                if now - buckets[key][0][2] >= self.max_wait_time:
+                    self._dispatch(buckets.pop(key))
+
+    def _dispatch(self, batch):
+        """Hand one batch to the dispatch pool so the collector keeps running"""
+        self._pool.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        """Run one batch through process_fn and resolve its futures"""
+        items = [entry[0] for entry in batch]
+
+        try:
+            results = self.process_fn(items)
+        except Exception as e:
+            for entry in batch:
+                entry[1].set_exception(e)
+            return
+
+        for entry, result in zip(batch, results):
+            entry[1].set_result(result)
@@ -1,6 +1,12 @@
 import numpy as np
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Union
 import os
+import threading
+
+try:
+    from pre_repr import PreprocessedDoc
+except ImportError:  # imported as part of the utils package
+    from utils.pre_repr import PreprocessedDoc
 
 try:
     from ultralytics import YOLO
@@ -21,77 +27,138 @@ class SignatureStampDetector:
         """
         self.model = None
         self.model_path = model_path
-        
+        self.device = 'cpu'
+
+        # Reusable grayscale/binary scratch buffers for the rule-based
+        # fallback, kept per-thread since detect() may run from pipeline
+        # worker threads
+        self._buffers = threading.local()
+
         try:
             if model_path and os.path.exists(model_path):
                 # Load custom trained model
-                self.model = YOLO(model_path)
-                print(f"Loaded custom YOLO model from {model_path}")
+                weights = model_path
+                self.model = YOLO(weights)
+                print(f"Loaded custom YOLO model from {weights}")
             else:
-                # Use pretrained YOLOv8-nano as base
-                # Note: This will need fine-tuning on signature/stamp data
-                self.model = YOLO('yolov8n.pt')
-                print("Loaded YOLOv8-nano base model (needs fine-tuning)")
-                
+                # Prefer an exported inference engine when one has been
+                # produced (see export_model below): TensorRT and ONNX
+                # Runtime run fused kernels well ahead of the default
+                # PyTorch forward. Fall back to the pretrained .pt base,
+                # which still needs fine-tuning on signature/stamp data.
+                weights = next(
+                    (p for p in ('yolov8n.engine', 'yolov8n.onnx') if os.path.exists(p)),
+                    'yolov8n.pt'
+                )
+                self.model = YOLO(weights, task='detect')
+                print(f"Loaded YOLO model from {weights}")
+
+            # Run on GPU in half precision when available; the conv backbone
+            # is compute-bound and FP16 keeps the tensor cores fed. Exported
+            # engine/onnx models manage their own device and precision.
+            if str(weights).endswith('.pt') and torch.cuda.is_available():
+                self.device = 'cuda'
+                self.model.to(self.device)
+                self.model.model.half()
+                print("YOLO model moved to CUDA (FP16)")
+
         except Exception as e:
             print(f"Error loading YOLO model: {e}")
             print("Will use rule-based fallback detection")
     
-    def detect(self, image: np.ndarray) -> Dict[str, Any]:
+    def detect(self, image: Union[np.ndarray, List[np.ndarray]]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
         """
-        Detect signatures and stamps in the document
-        
+        Detect signatures and stamps in one document or a batch of documents
+
+        Passing a list runs the whole batch through a single YOLO forward,
+        which keeps the GPU fed far better than per-image calls.
+
         Args:
-            image: Input image as numpy array
-            
+            image: Input image as numpy array, or a list of images
+
         Returns:
-            Dictionary containing detection results
+            Detection dictionary, or a list of them when given a list
         """
+        is_batch = isinstance(image, list)
+        docs = image if is_batch else [image]
+
+        # YOLO consumes the RGB plane; the rule-based fallback prefers the
+        # shared grayscale plane when a PreprocessedDoc is passed
+        images = [d.rgb if isinstance(d, PreprocessedDoc) else d for d in docs]
+        fallback_views = [d.gray if isinstance(d, PreprocessedDoc) else d for d in docs]
+
         if self.model is None:
             # Fallback to rule-based detection
-            return self._rule_based_detection(image)
-        
+            detections = [self._rule_based_detection(img) for img in fallback_views]
+            return detections if is_batch else detections[0]
+
         try:
-            # Run detection
-            results = self.model(image, conf=0.3, verbose=False)
-            
-            # Parse results
-            detections = {
-                'signature': {'present': False, 'bbox': None, 'confidence': 0.0},
-                'stamp': {'present': False, 'bbox': None, 'confidence': 0.0}
-            }
-            
-            if len(results) > 0 and len(results[0].boxes) > 0:
-                for box in results[0].boxes:
-                    cls_id = int(box.cls[0])
-                    confidence = float(box.conf[0])
-                    xyxy = box.xyxy[0].cpu().numpy()
-                    
-                    # Convert to [x, y, width, height]
-                    x1, y1, x2, y2 = xyxy
-                    bbox = [int(x1), int(y1), int(x2 - x1), int(y2 - y1)]
-                    
-                    # Assuming class 0 = signature, class 1 = stamp
-                    # This mapping depends on training data
-                    if cls_id == 0:
-                        detections['signature'] = {
-                            'present': True,
-                            'bbox': bbox,
-                            'confidence': confidence
-                        }
-                    elif cls_id == 1:
-                        detections['stamp'] = {
-                            'present': True,
-                            'bbox': bbox,
-                            'confidence': confidence
-                        }
-            
-            return detections
-            
+            # Run detection on the whole batch at once
+            results = self.model(
+                images,
+                conf=0.3,
+                imgsz=640,
+                half=(self.device == 'cuda'),
+                verbose=False
+            )
+            detections = [self._parse_result(result) for result in results]
+
         except Exception as e:
             print(f"Detection error: {e}")
-            return self._rule_based_detection(image)
+            detections = [self._rule_based_detection(img) for img in fallback_views]
+
+        return detections if is_batch else detections[0]
+
+    def _parse_result(self, result) -> Dict[str, Any]:
+        """Convert one YOLO result into a signature/stamp detection dict"""
+        detections = {
+            'signature': {'present': False, 'bbox': None, 'confidence': 0.0},
+            'stamp': {'present': False, 'bbox': None, 'confidence': 0.0}
+        }
+
+        if len(result.boxes) == 0:
+            return detections
+
+        # Pull all boxes to host in three transfers; per-box .cpu() calls
+        # each force a CUDA sync
+        xyxy = result.boxes.xyxy.cpu().numpy()
+        cls_ids = result.boxes.cls.cpu().numpy().astype(int)
+        confs = result.boxes.conf.cpu().numpy()
+
+        # Assuming class 0 = signature, class 1 = stamp
+        # This mapping depends on training data
+        for cls_id, name in ((0, 'signature'), (1, 'stamp')):
+            mask = cls_ids == cls_id
+            if not mask.any():
+                continue
+
+            # Keep the highest-confidence box for the class
+            idx = int(np.flatnonzero(mask)[np.argmax(confs[mask])])
+
+            # Convert to [x, y, width, height]
+            x1, y1, x2, y2 = xyxy[idx]
+            detections[name] = {
+                'present': True,
+                'bbox': [int(x1), int(y1), int(x2 - x1), int(y2 - y1)],
+                'confidence': float(confs[idx])
+            }
+
+        return detections
     
+    def _get_buffers(self, shape: Tuple[int, int]) -> Dict[str, np.ndarray]:
+        """Fetch (or allocate once) the scratch buffers for a region shape"""
+        by_shape = getattr(self._buffers, 'by_shape', None)
+        if by_shape is None:
+            by_shape = self._buffers.by_shape = {}
+
+        buf = by_shape.get(shape)
+        if buf is None:
+            buf = by_shape[shape] = {
+                'gray': np.empty(shape, dtype=np.uint8),
+                'binary': np.empty(shape, dtype=np.uint8)
+            }
+        return buf
+
     def _rule_based_detection(self, image: np.ndarray) -> Dict[str, Any]:
         """
         Fallback rule-based detection using image processing
@@ -107,55 +174,81 @@ class SignatureStampDetector:
         
         try:
             h, w = image.shape[:2]
-            
-            # Focus on bottom 30% of document (typical signature/stamp location)
+
+            # Focus on bottom 30% of document (typical signature/stamp location);
+            # slice first so the grayscale conversion only touches the bytes
+            # we actually analyze
             bottom_region = image[int(h * 0.7):, :]
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(bottom_region, cv2.COLOR_RGB2GRAY)
-            
+
+            # Write conversion/threshold output into reusable per-shape
+            # buffers instead of allocating fresh images every call
+            buf = self._get_buffers(bottom_region.shape[:2])
+
+            if image.ndim == 2:
+                # Already grayscale (e.g. shared preprocessed plane) — use as-is
+                gray = bottom_region
+            else:
+                gray = cv2.cvtColor(bottom_region, cv2.COLOR_RGB2GRAY, dst=buf['gray'])
+
             # Apply thresholding
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-            
-            # Find contours
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
+            _, binary = cv2.threshold(gray, 0, 255,
+                                      cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU,
+                                      dst=buf['binary'])
+
             detections = {
                 'signature': {'present': False, 'bbox': None, 'confidence': 0.5},
                 'stamp': {'present': False, 'bbox': None, 'confidence': 0.5}
             }
-            
-            # Analyze contours
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                
-                # Filter by area (signatures/stamps have specific size ranges)
-                if 1000 < area < 50000:
-                    x, y, w_box, h_box = cv2.boundingRect(contour)
-                    
-                    # Adjust y coordinate to full image
-                    y_full = y + int(h * 0.7)
-                    
-                    # Heuristic: wider objects are likely signatures, squarer ones are stamps
-                    aspect_ratio = w_box / h_box if h_box > 0 else 0
-                    
-                    if aspect_ratio > 1.5:
-                        # Likely signature (wider than tall)
-                        if not detections['signature']['present']:
-                            detections['signature'] = {
-                                'present': True,
-                                'bbox': [int(x), int(y_full), int(w_box), int(h_box)],
-                                'confidence': 0.5
-                            }
-                    elif 0.7 < aspect_ratio < 1.3:
-                        # Likely stamp (more square-ish)
-                        if not detections['stamp']['present']:
-                            detections['stamp'] = {
-                                'present': True,
-                                'bbox': [int(x), int(y_full), int(w_box), int(h_box)],
-                                'confidence': 0.5
-                            }
-            
+
+            # Label connected components once; stats gives us area and bbox
+            # for every component as vectors, so filtering is pure NumPy
+            # instead of a Python loop over contours
+            num_labels, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+
+            if num_labels <= 1:
+                return detections
+
+            # Row 0 is the background component
+            stats = stats[1:]
+            areas = stats[:, cv2.CC_STAT_AREA]
+            widths = stats[:, cv2.CC_STAT_WIDTH]
+            heights = stats[:, cv2.CC_STAT_HEIGHT]
+
+            # Filter by area (signatures/stamps have specific size ranges)
+            size_ok = (areas > 1000) & (areas < 50000)
+
+            # Heuristic: wider objects are likely signatures, squarer ones are stamps
+            aspect_ratio = widths / np.maximum(heights, 1)
+            signature_mask = size_ok & (aspect_ratio > 1.5)
+            stamp_mask = size_ok & (aspect_ratio > 0.7) & (aspect_ratio < 1.3)
+
+            # Adjust y coordinates back to the full image
+            y_offset = int(h * 0.7)
+
+            def best_bbox(mask):
+                # Largest qualifying component wins
+                idx = int(np.argmax(np.where(mask, areas, 0)))
+                return [
+                    int(stats[idx, cv2.CC_STAT_LEFT]),
+                    int(stats[idx, cv2.CC_STAT_TOP]) + y_offset,
+                    int(stats[idx, cv2.CC_STAT_WIDTH]),
+                    int(stats[idx, cv2.CC_STAT_HEIGHT])
+                ]
+
+            if signature_mask.any():
+                detections['signature'] = {
+                    'present': True,
+                    'bbox': best_bbox(signature_mask),
+                    'confidence': 0.5
+                }
+
+            if stamp_mask.any():
+                detections['stamp'] = {
+                    'present': True,
+                    'bbox': best_bbox(stamp_mask),
+                    'confidence': 0.5
+                }
+
             return detections
             
         except Exception as e:
@@ -188,8 +281,22 @@ class SignatureStampDetector:
         )
         
         print(f"Training complete! Model saved.")
-        
+
         return results
 
+    @staticmethod
+    def export_model(weights: str = 'yolov8n.pt', fmt: str = 'onnx'):
+        """
+        One-time export of the detection model to a faster inference backend
+
+        The exported file is picked up automatically on the next detector
+        construction.
 
-import os
+        Args:
+            weights: Source PyTorch weights to export
+            fmt: Target format ('onnx' or 'engine' for TensorRT)
+        """
+        model = YOLO(weights)
+        path = model.export(format=fmt, half=True, imgsz=640)
+        print(f"Exported detection model to {path}")
+        return path
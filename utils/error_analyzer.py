@@ -3,22 +3,29 @@ Error analysis module for categorizing and analyzing failures
 """
 
 from typing import Dict, List, Any
-from collections import defaultdict
+from collections import deque
+from itertools import islice
 import json
 
+# Error records are stored as (doc_id, field, reason, confidence) tuples;
+# a tuple is far cheaper to allocate than a 4-key dict, which matters when
+# a large batch logs thousands of errors
+_ERROR_CATEGORIES = (
+    'ocr_errors',
+    'extraction_errors',
+    'matching_errors',
+    'layout_errors',
+    'detection_errors'
+)
+
 
 class ErrorAnalyzer:
     """Analyze and categorize extraction errors"""
-    
+
     def __init__(self):
         """Initialize error analyzer"""
-        self.error_categories = {
-            'ocr_errors': [],
-            'extraction_errors': [],
-            'matching_errors': [],
-            'layout_errors': [],
-            'detection_errors': []
-        }
+        self.error_categories = {k: deque() for k in _ERROR_CATEGORIES}
+        self._total_errors = 0
     
     def analyze_result(self, result: Dict[str, Any], ground_truth: Dict[str, Any] = None):
         """
@@ -78,13 +85,9 @@ class ErrorAnalyzer:
             self._compare_with_ground_truth(result, ground_truth)
     
     def _log_error(self, category: str, doc_id: str, field: str, reason: str, confidence: float):
-        """Log an error"""
-        self.error_categories[category].append({
-            'doc_id': doc_id,
-            'field': field,
-            'reason': reason,
-            'confidence': confidence
-        })
+        """Log an error as a compact record tuple"""
+        self.error_categories[category].append((doc_id, field, reason, confidence))
+        self._total_errors += 1
     
     def _compare_with_ground_truth(self, result: Dict, ground_truth: Dict):
         """Compare result with ground truth"""
@@ -111,47 +114,54 @@ class ErrorAnalyzer:
         Get error analysis summary
         
         Returns:
-            Summary statistics by error category
+            Summary statistics by error category; 'errors' holds the raw
+            (doc_id, field, reason, confidence) record tuples
         """
         summary = {}
-        
+
         for category, errors in self.error_categories.items():
             summary[category] = {
                 'count': len(errors),
                 'errors': errors
             }
-        
-        total_errors = sum(len(errors) for errors in self.error_categories.values())
-        summary['total_errors'] = total_errors
-        
+
+        summary['total_errors'] = self._total_errors
+
         return summary
     
     def generate_report(self, output_path: str):
         """Generate error analysis report"""
         summary = self.get_summary()
-        
+
+        # Build the whole report in memory and write it in one call rather
+        # than issuing a syscall per line
+        lines = [
+            "=" * 60,
+            "ERROR ANALYSIS REPORT",
+            "=" * 60,
+            "",
+            f"Total Errors: {summary['total_errors']}",
+            ""
+        ]
+
+        for category, data in summary.items():
+            if category == 'total_errors':
+                continue
+
+            count = data['count']
+            if count == 0:
+                continue
+
+            lines.append(f"\n{category.upper().replace('_', ' ')}: {count}")
+            lines.append("-" * 40)
+
+            for doc_id, field, reason, confidence in islice(data['errors'], 10):  # Show first 10
+                lines.append(f"  Doc: {doc_id}")
+                lines.append(f"  Field: {field}")
+                lines.append(f"  Reason: {reason}")
+                lines.append(f"  Confidence: {confidence:.2f}\n")
+
         with open(output_path, 'w') as f:
-            f.write("="*60 + "\n")
-            f.write("ERROR ANALYSIS REPORT\n")
-            f.write("="*60 + "\n\n")
-            
-            f.write(f"Total Errors: {summary['total_errors']}\n\n")
-            
-            for category, data in summary.items():
-                if category == 'total_errors':
-                    continue
-                
-                count = data['count']
-                if count == 0:
-                    continue
-                
-                f.write(f"\n{category.upper().replace('_', ' ')}: {count}\n")
-                f.write("-" * 40 + "\n")
-                
-                for error in data['errors'][:10]:  # Show first 10
-                    f.write(f"  Doc: {error['doc_id']}\n")
-                    f.write(f"  Field: {error['field']}\n")
-                    f.write(f"  Reason: {error['reason']}\n")
-                    f.write(f"  Confidence: {error['confidence']:.2f}\n\n")
-        
+            f.write('\n'.join(lines) + '\n')
+
         print(f"Error analysis report saved to: {output_path}")
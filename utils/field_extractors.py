@@ -1,7 +1,209 @@
+import os
+import pickle
 import re
-from typing import Dict, Any, List, Optional
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
 from rapidfuzz import fuzz, process
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+@dataclass(slots=True)
+class FieldResult:
+    """
+    Extraction result for one scalar field
+
+    A slotted object is a fraction of the size of the 3-key dict it
+    replaces and attribute access skips the hash lookups, which adds up
+    when thousands of documents flow through validation.
+    """
+    value: Any
+    confidence: float
+    explanation: str
+
+
+# Keyword sets for candidate line selection
+_DEALER_KEYWORDS = ('motors', 'auto', 'tractors', 'pvt', 'ltd', 'limited', 'company', 'dealer')
+_BRAND_KEYWORDS = ('mahindra', 'john deere', 'sonalika', 'tafe', 'new holland',
+                   'kubota', 'massey ferguson', 'farmtrac', 'powertrac')
+
+
+def _build_automaton(keywords: Tuple[str, ...]):
+    """Build an Aho-Corasick automaton over the keywords (None if unavailable)"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for kw in keywords:
+        automaton.add_word(kw, kw)
+    automaton.make_automaton()
+    return automaton
+
+
+def _keyword_hit_lines(lines_lower: List[str], automaton, keywords: Tuple[str, ...]) -> List[int]:
+    """
+    Indices of lines containing at least one keyword
+
+    With pyahocorasick installed this is a single O(text_len) automaton
+    pass over the joined text, with hit offsets mapped back to lines via
+    bisect; otherwise it falls back to per-line substring checks.
+    """
+    if automaton is None:
+        return [i for i, line in enumerate(lines_lower)
+                if any(kw in line for kw in keywords)]
+
+    # Offsets where each line starts inside the joined text
+    line_starts = []
+    offset = 0
+    for line in lines_lower:
+        line_starts.append(offset)
+        offset += len(line) + 1  # +1 for the joining newline
+
+    joined = '\n'.join(lines_lower)
+    hit_lines = set()
+    for end_idx, _kw in automaton.iter(joined):
+        hit_lines.add(bisect_right(line_starts, end_idx) - 1)
+
+    return sorted(hit_lines)
+
+
+# Compiled once at import as single alternations, so the OCR text is
+# scanned in one linear pass instead of once per pattern
+_HP_RE = re.compile(
+    r'(\d+)\s*(?:HP|horse\s*power)'
+    r'|(?:HP|Power)\s*[:\-]?\s*(\d+)',
+    re.IGNORECASE
+)
+
+_COST_RE = re.compile(
+    r'(?:total|cost|price|amount|value)\s*[:\-]?\s*(?:rs\.?|₹)?\s*([\d,]+(?:\.\d{2})?)'
+    r'|(?:rs\.?|₹)\s*([\d,]+(?:\.\d{2})?)'
+    r'|([\d,]+(?:\.\d{2})?)\s*(?:rupees|lakhs?)',
+    re.IGNORECASE
+)
+
+
+def _parse_amounts(buf: np.ndarray) -> np.ndarray:
+    """
+    Parse a padded ASCII byte matrix of numeric strings into floats
+
+    One row per candidate, commas skipped, '.' starting the fractional
+    part, NUL padding terminating the row. Compiled with numba when it is
+    installed, which removes the per-candidate Python float()/str work;
+    the plain-Python version is the fallback.
+    """
+    values = np.empty(buf.shape[0], dtype=np.float64)
+    for i in range(buf.shape[0]):
+        value = 0.0
+        frac = 0.0
+        scale = 0.1
+        in_frac = False
+        for j in range(buf.shape[1]):
+            c = buf[i, j]
+            if c == 0:
+                break
+            if 48 <= c <= 57:
+                d = c - 48
+                if in_frac:
+                    frac += d * scale
+                    scale *= 0.1
+                else:
+                    value = value * 10.0 + d
+            elif c == 46:  # '.'
+                in_frac = True
+            # commas (44) are digit-group separators; skip them
+        values[i] = value + frac
+    return values
+
+
+if njit is not None:
+    _parse_amounts = njit(cache=True)(_parse_amounts)
+
+
+def _encode_amounts(raw: List[str]) -> np.ndarray:
+    """Pack numeric match strings into a NUL-padded uint8 matrix"""
+    width = max(len(s) for s in raw)
+    return np.array(raw, dtype=f'S{width}').view(np.uint8).reshape(len(raw), width)
+
+
+@lru_cache(maxsize=4)
+def _load_master_list_cached(abs_path: str, mtime: float):
+    """
+    Load a master list plus its normalized lookup map, cached twice over
+
+    Within a process, every FieldExtractor shares the same immutable
+    entry via the lru_cache; across process startups, the parsed and
+    pre-normalized form is pickled next to the source file so repeated
+    worker launches pay only the unpickle cost. A changed source mtime
+    invalidates both layers.
+
+    Returns:
+        (raw tuple, {normalized: original} map)
+    """
+    cache_path = abs_path + '.cache.pkl'
+    try:
+        if os.path.getmtime(cache_path) >= mtime:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError):
+        pass
+
+    with open(abs_path, 'r', encoding='utf-8') as f:
+        raw = tuple(line.strip() for line in f if line.strip())
+    entry = (raw, {s.lower().strip(): s for s in raw})
+
+    try:
+        with open(cache_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+
+    return entry
+
+
+@lru_cache(maxsize=8)
+def _make_matcher(master: Tuple[str, ...], score_cutoff: int):
+    """
+    Build a memoized single-candidate matcher for a master list
+
+    Invoices in a batch repeat the same dealer/model strings, so the
+    per-candidate lru_cache turns most lookups into a dict hit. The
+    matcher is a module-level closure over the frozen master tuple
+    (caching bound methods would leak the extractor instance).
+    """
+
+    @lru_cache(maxsize=4096)
+    def match(candidate: str) -> Tuple[Optional[str], float]:
+        if not master:
+            return (None, 0.0)
+
+        scores = process.cdist(
+            (candidate,),
+            master,
+            scorer=fuzz.ratio,
+            score_cutoff=score_cutoff,
+            workers=-1
+        )
+        col = int(np.argmax(scores[0]))
+        score = float(scores[0, col])
+
+        if score > 0:
+            return (master[col], score)
+        return (None, 0.0)
+
+    return match
+
 
 class FieldExtractor:
     """Extract and match specific fields from invoice data"""
@@ -14,20 +216,35 @@ class FieldExtractor:
             dealer_master_path: Path to dealer master list file
             asset_master_path: Path to asset (tractor model) master list file
         """
-        self.dealer_master = self._load_master_list(dealer_master_path)
-        self.asset_master = self._load_master_list(asset_master_path)
-        
+        self.dealer_master, _ = self._load_master_list(dealer_master_path)
+        self.asset_master, self.asset_master_norm = self._load_master_list(asset_master_path)
+
+        # Hashed views for O(1) exact membership tests; the case-folded
+        # asset map comes prebuilt from the cached load above
+        self.dealer_master_set = set(self.dealer_master)
+        self.asset_master_set = set(self.asset_master)
+
+        # Memoized per-candidate fuzzy matchers (shared across instances
+        # with identical master lists)
+        self._match_dealer = _make_matcher(self.dealer_master, 90)
+        self._match_model = _make_matcher(self.asset_master, 95)
+
+        # Multi-keyword automatons for candidate line selection (None when
+        # pyahocorasick is not installed; extractors then fall back to
+        # per-line substring checks)
+        self._dealer_ac = _build_automaton(_DEALER_KEYWORDS)
+        self._brand_ac = _build_automaton(_BRAND_KEYWORDS)
+
         print(f"Loaded {len(self.dealer_master)} dealers and {len(self.asset_master)} models")
     
-    def _load_master_list(self, file_path: str) -> List[str]:
-        """Load master list from file"""
+    def _load_master_list(self, file_path: str):
+        """Load master list from file (shared across instances via cache)"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                items = [line.strip() for line in f if line.strip()]
-            return items
-        except FileNotFoundError:
+            abs_path = os.path.abspath(file_path)
+            return _load_master_list_cached(abs_path, os.path.getmtime(abs_path))
+        except (FileNotFoundError, OSError):
             print(f"Warning: Master list not found: {file_path}")
-            return []
+            return (), {}
     
     def extract_all_fields(
         self,
@@ -40,22 +257,30 @@ class FieldExtractor:
         
         Args:
             ocr_result: OCR extraction result
-            vlm_result: VLM extraction result
-            detection_result: Signature/stamp detection result
-            
+            vlm_result: VLM extraction result (None for OCR-only extraction)
+            detection_result: Signature/stamp detection result (may be None)
+
         Returns:
             Dictionary with all extracted fields
         """
         fields = {}
-        
-        # Combine text sources
+
+        if vlm_result is None:
+            vlm_result = {}
+        if detection_result is None:
+            detection_result = {}
+
+        # Combine text sources; split and lowercase the OCR lines once so
+        # the per-field extractors don't each re-scan the same text
         ocr_text = ocr_result.get('full_text', '')
-        
+        ocr_lines = ocr_text.split('\n')
+        ocr_lines_lower = [line.lower() for line in ocr_lines]
+
         # Extract Dealer Name
-        fields['dealer_name'] = self.extract_dealer_name(ocr_text, vlm_result)
-        
+        fields['dealer_name'] = self.extract_dealer_name(ocr_lines, ocr_lines_lower, vlm_result)
+
         # Extract Model Name
-        fields['model_name'] = self.extract_model_name(ocr_text, vlm_result)
+        fields['model_name'] = self.extract_model_name(ocr_lines, ocr_lines_lower, vlm_result)
         
         # Extract Horse Power
         fields['horse_power'] = self.extract_horse_power(ocr_text, vlm_result)
@@ -77,18 +302,30 @@ class FieldExtractor:
         
         return fields
     
-    def extract_dealer_name(self, ocr_text: str, vlm_result: Dict) -> Dict[str, Any]:
+    def extract_dealer_name(
+        self,
+        ocr_lines: List[str],
+        ocr_lines_lower: List[str],
+        vlm_result: Dict
+    ) -> FieldResult:
         """
         Extract and fuzzy match dealer name
-        
+
         Returns:
-            Dict with matched_name, confidence, and explanation
+            FieldResult with value, confidence, and explanation
         """
-        # Try VLM result first
+        # Try VLM result first; an exact master hit makes the OCR
+        # candidate extraction and fuzzy scoring below redundant
         vlm_dealer = vlm_result.get('dealer_name')
-        
+        if vlm_dealer and vlm_dealer in self.dealer_master_set:
+            return FieldResult(
+                value=vlm_dealer,
+                confidence=1.0,
+                explanation=f"VLM dealer '{vlm_dealer}' matches master exactly"
+            )
+
         # Also extract from OCR text (look for common patterns)
-        ocr_candidates = self._extract_dealer_candidates(ocr_text)
+        ocr_candidates = self._extract_dealer_candidates(ocr_lines, ocr_lines_lower)
         
         # Combine candidates
         candidates = []
@@ -96,71 +333,75 @@ class FieldExtractor:
             candidates.append(vlm_dealer)
         candidates.extend(ocr_candidates)
         
-        # Fuzzy match against master list
+        # Fuzzy match candidates through the memoized matcher; repeated
+        # dealer strings across a batch resolve from the cache without
+        # touching rapidfuzz at all
         best_match = None
         best_score = 0
         best_candidate = None
-        
+
         for candidate in candidates:
             if not candidate:
                 continue
-            
-            # Find best match in master list
-            result = process.extractOne(
-                candidate,
-                self.dealer_master,
-                scorer=fuzz.ratio
-            )
-            
-            if result and result[1] > best_score:
-                best_match = result[0]
-                best_score = result[1]
+
+            match, score = self._match_dealer(candidate.strip())
+            if match is not None and score > best_score:
+                best_match = match
+                best_score = score
                 best_candidate = candidate
-        
+
         # Check if match meets threshold (90%)
         if best_score >= 90:
-            return {
-                'value': best_match,
-                'confidence': best_score / 100,
-                'explanation': f"Fuzzy matched '{best_candidate}' to '{best_match}' with {best_score}% similarity"
-            }
+            return FieldResult(
+                value=best_match,
+                confidence=best_score / 100,
+                explanation=f"Fuzzy matched '{best_candidate}' to '{best_match}' with {best_score}% similarity"
+            )
         else:
-            return {
-                'value': None,
-                'confidence': 0.0,
-                'explanation': f"No dealer match found (best: {best_score}%)"
-            }
+            return FieldResult(
+                value=None,
+                confidence=0.0,
+                explanation=f"No dealer match found (best: {best_score}%)"
+            )
     
-    def _extract_dealer_candidates(self, text: str) -> List[str]:
-        """Extract potential dealer names from text"""
+    def _extract_dealer_candidates(self, lines: List[str], lines_lower: List[str]) -> List[str]:
+        """Extract potential dealer names from precomputed OCR lines"""
         candidates = []
-        
+
         # Look for lines with dealer-like keywords
-        keywords = ['motors', 'auto', 'tractors', 'pvt', 'ltd', 'limited', 'company', 'dealer']
-        
-        for line in text.split('\n'):
-            line = line.strip()
-            if any(kw in line.lower() for kw in keywords):
-                # Clean up the line
-                cleaned = re.sub(r'[^\w\s]', ' ', line)
-                cleaned = ' '.join(cleaned.split())
-                if len(cleaned) > 5:
-                    candidates.append(cleaned)
-        
+        for i in _keyword_hit_lines(lines_lower, self._dealer_ac, _DEALER_KEYWORDS):
+            # Clean up the line
+            cleaned = re.sub(r'[^\w\s]', ' ', lines[i].strip())
+            cleaned = ' '.join(cleaned.split())
+            if len(cleaned) > 5:
+                candidates.append(cleaned)
+
         return candidates[:5]  # Return top 5 candidates
     
-    def extract_model_name(self, ocr_text: str, vlm_result: Dict) -> Dict[str, Any]:
+    def extract_model_name(
+        self,
+        ocr_lines: List[str],
+        ocr_lines_lower: List[str],
+        vlm_result: Dict
+    ) -> FieldResult:
         """
         Extract and exactly match model name
-        
+
         Returns:
-            Dict with matched_name, confidence, and explanation
+            FieldResult with value, confidence, and explanation
         """
-        # Try VLM result first
+        # Try VLM result first; an exact master hit skips OCR candidate
+        # extraction entirely
         vlm_model = vlm_result.get('model_name')
-        
+        if vlm_model and vlm_model in self.asset_master_set:
+            return FieldResult(
+                value=vlm_model,
+                confidence=1.0,
+                explanation=f"Exact match found: {vlm_model}"
+            )
+
         # Extract from OCR (look for model patterns)
-        ocr_models = self._extract_model_candidates(ocr_text)
+        ocr_models = self._extract_model_candidates(ocr_lines, ocr_lines_lower)
         
         # Combine candidates
         candidates = []
@@ -168,149 +409,133 @@ class FieldExtractor:
             candidates.append(vlm_model)
         candidates.extend(ocr_models)
         
-        # Try exact matching with some OCR error tolerance
+        candidates = [c for c in candidates if c]
+
+        # Try exact matching first (hashed lookups, then case-folded)
         for candidate in candidates:
-            if not candidate:
-                continue
-            
-            # Try exact match
-            if candidate in self.asset_master:
-                return {
-                    'value': candidate,
-                    'confidence': 1.0,
-                    'explanation': f"Exact match found: {candidate}"
-                }
-            
-            # Try fuzzy match (high threshold for "exact"-ish match)
-            result = process.extractOne(
-                candidate,
-                self.asset_master,
-                scorer=fuzz.ratio
+            if candidate in self.asset_master_set:
+                return FieldResult(
+                    value=candidate,
+                    confidence=1.0,
+                    explanation=f"Exact match found: {candidate}"
+                )
+            normalized = self.asset_master_norm.get(candidate.lower().strip())
+            if normalized is not None:
+                return FieldResult(
+                    value=normalized,
+                    confidence=1.0,
+                    explanation=f"Exact match found: {normalized}"
+                )
+
+        # Fuzzy match through the memoized matcher with a very high
+        # threshold for "exact"-ish model name matches
+        best = None
+        for candidate in candidates:
+            match, score = self._match_model(candidate.strip())
+            if match is not None and (best is None or score > best[2]):
+                best = (candidate, match, score)
+
+        if best is not None:
+            candidate, matched, score = best
+            return FieldResult(
+                value=matched,
+                confidence=score / 100,
+                explanation=f"Matched '{candidate}' to '{matched}' ({score}%)"
             )
-            
-            if result and result[1] >= 95:  # Very high threshold for model names
-                return {
-                    'value': result[0],
-                    'confidence': result[1] / 100,
-                    'explanation': f"Matched '{candidate}' to '{result[0]}' ({result[1]}%)"
-                }
-        
-        return {
-            'value': None,
-            'confidence': 0.0,
-            'explanation': "No model match found in asset master"
-        }
+
+        return FieldResult(
+            value=None,
+            confidence=0.0,
+            explanation="No model match found in asset master"
+        )
     
-    def _extract_model_candidates(self, text: str) -> List[str]:
-        """Extract potential tractor model names"""
-        candidates = []
-        
-        # Common tractor brands
-        brands = ['mahindra', 'john deere', 'sonalika', 'tafe', 'new holland', 
-                  'kubota', 'massey ferguson', 'farmtrac', 'powertrac']
-        
-        for line in text.split('\n'):
-            line_lower = line.lower()
-            if any(brand in line_lower for brand in brands):
-                # Extract model info
-                cleaned = line.strip()
-                candidates.append(cleaned)
-        
+    def _extract_model_candidates(self, lines: List[str], lines_lower: List[str]) -> List[str]:
+        """Extract potential tractor model names from precomputed OCR lines"""
+        # Lines mentioning a common tractor brand
+        candidates = [
+            lines[i].strip()
+            for i in _keyword_hit_lines(lines_lower, self._brand_ac, _BRAND_KEYWORDS)
+        ]
+
         return candidates[:10]
     
-    def extract_horse_power(self, ocr_text: str, vlm_result: Dict) -> Dict[str, Any]:
+    def extract_horse_power(self, ocr_text: str, vlm_result: Dict) -> FieldResult:
         """
         Extract horse power (HP) value
         
         Returns:
-            Dict with value (numeric), confidence, and explanation
+            FieldResult with value (numeric), confidence, and explanation
         """
         # Try VLM result first
         vlm_hp = vlm_result.get('horse_power')
         if vlm_hp is not None:
-            return {
-                'value': int(vlm_hp),
-                'confidence': 0.9,
-                'explanation': f"Extracted {int(vlm_hp)} HP from VLM"
-            }
-        
-        # Extract from OCR using regex patterns
-        hp_patterns = [
-            r'(\d+)\s*HP',
-            r'(\d+)\s*hp',
-            r'(\d+)\s*horse\s*power',
-            r'HP\s*[:\-]?\s*(\d+)',
-            r'Power\s*[:\-]?\s*(\d+)',
-        ]
-        
-        for pattern in hp_patterns:
-            matches = re.findall(pattern, ocr_text, re.IGNORECASE)
-            if matches:
-                # Take the first match
-                hp_value = int(matches[0])
-                # Validate range (tractor HP typically 20-150)
-                if 20 <= hp_value <= 150:
-                    return {
-                        'value': hp_value,
-                        'confidence': 0.85,
-                        'explanation': f"Extracted {hp_value} HP using pattern '{pattern}'"
-                    }
+            return FieldResult(
+                value=int(vlm_hp),
+                confidence=0.9,
+                explanation=f"Extracted {int(vlm_hp)} HP from VLM"
+            )
         
-        return {
-            'value': None,
-            'confidence': 0.0,
-            'explanation': "No HP value found"
-        }
+        # One linear scan over the OCR text covers every HP pattern; the
+        # numeric strings are then parsed in bulk by the shared kernel
+        matches = [(m.group(1) or m.group(2), m.group(0).strip())
+                   for m in _HP_RE.finditer(ocr_text)]
+
+        if matches:
+            values = _parse_amounts(_encode_amounts([v for v, _ in matches]))
+            # Validate range (tractor HP typically 20-150)
+            in_range = np.flatnonzero((values >= 20) & (values <= 150))
+            if in_range.size:
+                idx = int(in_range[0])
+                hp_value = int(values[idx])
+                return FieldResult(
+                    value=hp_value,
+                    confidence=0.85,
+                    explanation=f"Extracted {hp_value} HP from '{matches[idx][1]}'"
+                )
+        
+        return FieldResult(
+            value=None,
+            confidence=0.0,
+            explanation="No HP value found"
+        )
     
-    def extract_asset_cost(self, ocr_text: str, vlm_result: Dict) -> Dict[str, Any]:
+    def extract_asset_cost(self, ocr_text: str, vlm_result: Dict) -> FieldResult:
         """
         Extract asset cost (total price)
         
         Returns:
-            Dict with value (numeric), confidence, and explanation
+            FieldResult with value (numeric), confidence, and explanation
         """
         # Try VLM result first
         vlm_cost = vlm_result.get('asset_cost')
         if vlm_cost is not None:
-            return {
-                'value': float(vlm_cost),
-                'confidence': 0.9,
-                'explanation': f"Extracted cost ₹{vlm_cost:,.2f} from VLM"
-            }
-        
-        # Extract from OCR using regex patterns
-        cost_patterns = [
-            r'(?:total|cost|price|amount|value)\s*[:\-]?\s*(?:rs\.?|₹)?\s*([\d,]+(?:\.\d{2})?)',
-            r'(?:rs\.?|₹)\s*([\d,]+(?:\.\d{2})?)',
-            r'([\d,]+(?:\.\d{2})?)\s*(?:rupees|lakhs?)',
-        ]
-        
-        candidates = []
-        
-        for pattern in cost_patterns:
-            matches = re.findall(pattern, ocr_text, re.IGNORECASE)
-            for match in matches:
-                # Clean and convert
-                value_str = match.replace(',', '').strip()
-                try:
-                    value = float(value_str)
-                    # Validate range (tractor cost typically 3-15 lakhs)
-                    if 300000 <= value <= 1500000:
-                        candidates.append((value, pattern))
-                except ValueError:
-                    continue
-        
-        if candidates:
-            # Take the highest value (likely the total)
-            best_value, best_pattern = max(candidates, key=lambda x: x[0])
-            return {
-                'value': best_value,
-                'confidence': 0.85,
-                'explanation': f"Extracted cost ₹{best_value:,.2f} using pattern '{best_pattern}'"
-            }
+            return FieldResult(
+                value=float(vlm_cost),
+                confidence=0.9,
+                explanation=f"Extracted cost ₹{vlm_cost:,.2f} from VLM"
+            )
         
-        return {
-            'value': None,
-            'confidence': 0.0,
-            'explanation': "No valid cost found"
-        }
+        # One linear scan over the OCR text covers every cost pattern; the
+        # digit-group strings are parsed in bulk by the shared kernel
+        matches = [(m.group(1) or m.group(2) or m.group(3), m.group(0).strip())
+                   for m in _COST_RE.finditer(ocr_text)]
+
+        if matches:
+            values = _parse_amounts(_encode_amounts([v for v, _ in matches]))
+            # Validate range (tractor cost typically 3-15 lakhs) and take
+            # the highest in-range value (likely the total)
+            in_range = (values >= 300000) & (values <= 1500000)
+            if in_range.any():
+                idx = int(np.argmax(np.where(in_range, values, 0.0)))
+                best_value = float(values[idx])
+                return FieldResult(
+                    value=best_value,
+                    confidence=0.85,
+                    explanation=f"Extracted cost ₹{best_value:,.2f} from '{matches[idx][1]}'"
+                )
+        
+        return FieldResult(
+            value=None,
+            confidence=0.0,
+            explanation="No valid cost found"
+        )
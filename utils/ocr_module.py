@@ -1,24 +1,94 @@
+import os
+
 import numpy as np
 from typing import List, Dict, Tuple, Any
+
+try:
+    from pre_repr import PreprocessedDoc
+except ImportError:  # imported as part of the utils package
+    from utils.pre_repr import PreprocessedDoc
+
 try:
     from paddleocr import PaddleOCR
 except ImportError:
     print("Warning: PaddleOCR not installed. Run: pip install paddleocr")
 
 
+# Process-wide PaddleOCR engines, keyed by construction options. Each
+# engine loads ~100MB of detection/recognition weights, so extra
+# OCRExtractor instances (e.g. one per batch worker) reuse the loaded
+# engine instead of paying the cold start again; forked workers share
+# the pages copy-on-write.
+_OCR_CACHE: dict = {}
+
+# Directory holding ONNX-exported detection/recognition/classifier models
+# (see export_ocr_to_onnx below); when present, PaddleOCR runs them through
+# onnxruntime instead of the FP32 Paddle inference engine
+_ONNX_MODEL_DIR = 'ocr_onnx'
+_ONNX_MODELS = {
+    'det_model_dir': 'det.onnx',
+    'rec_model_dir': 'rec.onnx',
+    'cls_model_dir': 'cls.onnx',
+}
+
+
+def _onnx_model_kwargs() -> Dict[str, str]:
+    """PaddleOCR kwargs for the ONNX backend, or {} if models are missing"""
+    paths = {k: os.path.join(_ONNX_MODEL_DIR, v) for k, v in _ONNX_MODELS.items()}
+    if all(os.path.exists(p) for p in paths.values()):
+        return dict(use_onnx=True, **paths)
+    return {}
+
+
+def export_ocr_to_onnx(onnx_dir: str = _ONNX_MODEL_DIR):
+    """
+    One-time INT8 quantization of ONNX-exported OCR models
+
+    The .onnx files are produced from the PaddleOCR inference checkpoints
+    with paddle2onnx, e.g.:
+
+        paddle2onnx --model_dir <det_inference_dir> \\
+            --model_filename inference.pdmodel \\
+            --params_filename inference.pdiparams \\
+            --save_file ocr_onnx/det.onnx
+
+    This helper then quantizes the weights to INT8 in place, which halves
+    the weight bandwidth and lets onnxruntime use VNNI integer kernels on
+    recent CPUs. The quantized models are picked up automatically on the
+    next OCRExtractor construction.
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    for name in _ONNX_MODELS.values():
+        path = os.path.join(onnx_dir, name)
+        if os.path.exists(path):
+            quantize_dynamic(path, path, weight_type=QuantType.QUInt8)
+            print(f"Quantized {path} to INT8")
+
+
 class OCRExtractor:
     
     def __init__(self, languages: List[str] = ['en', 'hi', 'te']):
+        """
+        Initialize OCR extractor
+
+        Args:
             languages: List of language codes (en=English, hi=Hindi, te=Telugu/South Indian)
         """
         try:
-            # Initialize PaddleOCR with multilingual support
-            self.ocr = PaddleOCR(
-                use_angle_cls=True,  # Enable angle classification
-                lang='en',  # Primary language
-                use_gpu=False,  # Use CPU for cost efficiency
-                show_log=False
-            )
+            key = (tuple(languages), False)
+            if key not in _OCR_CACHE:
+                # Initialize PaddleOCR with multilingual support; prefer
+                # ONNX-exported (and INT8-quantized) models when available
+                _OCR_CACHE[key] = PaddleOCR(
+                    use_angle_cls=True,  # Enable angle classification
+                    lang='en',  # Primary language
+                    use_gpu=False,  # Use CPU for cost efficiency
+                    show_log=False,
+                    cpu_threads=os.cpu_count(),
+                    **_onnx_model_kwargs()
+                )
+            self.ocr = _OCR_CACHE[key]
         except Exception as e:
             print(f"Error initializing PaddleOCR: {e}")
             self.ocr = None
@@ -33,6 +103,9 @@ class OCRExtractor:
         Returns:
             Dictionary containing extracted text, bounding boxes, and confidence scores
         """
+        if isinstance(image, PreprocessedDoc):
+            image = image.rgb
+
         if self.ocr is None:
             # Fallback: return empty result
             return {
@@ -78,7 +151,7 @@ class OCRExtractor:
                 'bboxes': bboxes,
                 'confidences': confidences,
                 'num_lines': len(text_lines),
-                'avg_confidence': np.mean(confidences) if confidences else 0.0
+                'avg_confidence': sum(confidences) / len(confidences) if confidences else 0.0
             }
             
         except Exception as e:
@@ -0,0 +1,55 @@
+"""
+Shared preprocessed-document representation
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+
+@dataclass
+class PreprocessedDoc:
+    """
+    Preprocessed image carrying the view each pipeline stage needs
+
+    The RGB and grayscale planes are produced once during preprocessing
+    and share the document's pixels; the PIL and tensor views are derived
+    lazily and cached. OCR, VLM, and detection each pick the view they
+    consume instead of re-converting (and re-allocating) their own copy,
+    which halves peak memory on large scans.
+    """
+    rgb: np.ndarray
+    gray: np.ndarray
+    _pil: Optional[Image.Image] = field(default=None, repr=False, compare=False)
+
+    @property
+    def shape(self):
+        """Shape of the RGB plane, so callers can treat this like an array"""
+        return self.rgb.shape
+
+    @property
+    def pil(self) -> Image.Image:
+        """PIL view of the RGB plane (created once, then cached)"""
+        if self._pil is None:
+            self._pil = Image.fromarray(self.rgb)
+        return self._pil
+
+    def tensor_chw(self, dtype=None):
+        """
+        Zero-copy torch CHW view of the RGB plane
+
+        Args:
+            dtype: Optional torch dtype to cast to (e.g. torch.float16)
+
+        Returns:
+            Tensor of shape (3, H, W) sharing memory with the RGB plane
+            unless a cast is requested
+        """
+        import torch
+
+        tensor = torch.from_numpy(self.rgb).permute(2, 0, 1)
+        if dtype is not None:
+            tensor = tensor.to(dtype)
+        return tensor
@@ -3,31 +3,72 @@ import numpy as np
 from PIL import Image
 from pathlib import Path
 
+try:
+    from pre_repr import PreprocessedDoc
+except ImportError:  # imported as part of the utils package
+    from utils.pre_repr import PreprocessedDoc
 
-def preprocess_image(image_path: str) -> np.ndarray:
+_RAD2DEG = 180.0 / np.pi
+
+
+def _is_gray(image) -> bool:
+    """True for single-plane input (UMat handles carry no ndim)"""
+    return isinstance(image, cv2.UMat) or image.ndim == 2
+
+
+def preprocess_image(image_path: str) -> PreprocessedDoc:
     if isinstance(image_path, str):
         img = cv2.imread(str(image_path))
     else:
         img = image_path
-    
+
     if img is None:
         raise ValueError(f"Failed to load image: {image_path}")
-    
-    # Convert to RGB
+
+    # Collapse to a single grayscale plane up front: every step below
+    # (deskew, denoise, CLAHE, threshold) works on gray anyway, and the
+    # OCR engine grays internally too, so carrying three channels through
+    # the chain only triples the memory traffic
     if len(img.shape) == 2:
-        img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+        gray = img
     elif img.shape[2] == 4:
-        img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGB)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
     else:
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    
-    # Apply preprocessing pipeline
-    img = deskew(img)
-    img = denoise(img)
-    img = enhance_contrast(img)
-    img = binarize_adaptive(img)
-    
-    return img
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    # Downsample before the expensive steps: NLM denoising and Hough both
+    # scale with pixel count, and OCR accuracy on these invoices saturates
+    # around 1500px height, so a 4000px scan is pure extra work
+    gray = resize_if_large(gray, max_dimension=1600)
+
+    # Apply preprocessing pipeline on the grayscale plane
+    gray = deskew(gray)
+
+    # Route the filter-heavy tail through OpenCV's T-API: with OpenCL
+    # available, the denoise/CLAHE/threshold kernels run on the
+    # integrated GPU transparently, with no algorithmic change
+    use_ocl = cv2.ocl.haveOpenCL()
+    if use_ocl:
+        gray = cv2.UMat(gray)
+
+    gray = denoise(gray)
+    gray = enhance_contrast(gray)
+
+    # Binarize once and keep both the grayscale plane and an RGB view so
+    # downstream stages can share them without re-converting. Mean-based
+    # adaptive thresholding runs off a single integral-image pass, about
+    # half the cost of the Gaussian variant's separable blur, with no
+    # visible difference on printed text
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+        cv2.THRESH_BINARY, 15, 5
+    )
+    if use_ocl:
+        # Downstream consumers (OCR, detection) need host numpy arrays
+        binary = binary.get()
+    binary_rgb = cv2.cvtColor(binary, cv2.COLOR_GRAY2RGB)
+
+    return PreprocessedDoc(rgb=binary_rgb, gray=binary)
 
 
 def deskew(image: np.ndarray) -> np.ndarray:
@@ -40,28 +81,34 @@ def deskew(image: np.ndarray) -> np.ndarray:
     Returns:
         Deskewed image
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
     gray = cv2.bitwise_not(gray)
     
     # Detect edges
     edges = cv2.Canny(gray, 50, 150, apertureSize=3)
-    
+
+    # Cheap alignment check before paying for Hough: on an already-level
+    # scan the text baselines concentrate edge pixels into sharp row
+    # peaks, so a high row-sum coefficient of variation means there is no
+    # skew worth correcting
+    row_sum = edges.sum(axis=1, dtype=np.int64)
+    mean = row_sum.mean()
+    if mean > 0 and row_sum.std() / mean > 2.0:
+        return image
+
     # Detect lines using Hough transform
     lines = cv2.HoughLines(edges, 1, np.pi / 180, 200)
     
     if lines is None:
         return image
-    
-    # Calculate average angle
-    angles = []
-    for rho, theta in lines[:, 0]:
-        angle = np.degrees(theta) - 90
-        if -45 < angle < 45:
-            angles.append(angle)
-    
-    if not angles:
+
+    # Calculate average angle (vectorized over all detected lines)
+    angles = lines[:, 0, 1] * _RAD2DEG - 90
+    angles = angles[(angles > -45) & (angles < 45)]
+
+    if angles.size == 0:
         return image
-    
+
     median_angle = np.median(angles)
     
     # Rotate image if skew is significant
@@ -87,9 +134,10 @@ def denoise(image: np.ndarray) -> np.ndarray:
     Returns:
         Denoised image
     """
-    # Use Non-local Means Denoising for color images
-    denoised = cv2.fastNlMeansDenoisingColored(image, None, 10, 10, 7, 21)
-    return denoised
+    # Bilateral filtering preserves text edges about as well as NL-Means
+    # on scanned documents at a fraction of the cost: O(pixels * kernel^2)
+    # instead of NL-Means' patch search over a 21px window per pixel
+    return cv2.bilateralFilter(image, 5, 50, 50)
 
 
 def enhance_contrast(image: np.ndarray) -> np.ndarray:
@@ -102,6 +150,12 @@ def enhance_contrast(image: np.ndarray) -> np.ndarray:
     Returns:
         Contrast-enhanced image
     """
+    if _is_gray(image):
+        # CLAHE applies directly to a grayscale plane; the LAB round-trip
+        # below only exists to isolate luminance from color images
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        return clahe.apply(image)
+
     # Convert to LAB color space
     lab = cv2.cvtColor(image, cv2.COLOR_RGB2LAB)
     
@@ -129,12 +183,13 @@ def binarize_adaptive(image: np.ndarray) -> np.ndarray:
     Returns:
         Binarized image (kept in RGB for consistency)
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-    
-    # Apply adaptive thresholding
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+    # Apply adaptive thresholding (mean-based: integral image beats the
+    # Gaussian variant's two-pass blur for document binarization)
     binary = cv2.adaptiveThreshold(
-        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-        cv2.THRESH_BINARY, 11, 2
+        gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+        cv2.THRESH_BINARY, 15, 5
     )
     
     # Convert back to RGB
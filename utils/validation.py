@@ -2,7 +2,14 @@
 Validation and post-processing logic for extracted fields
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List
+
+import numpy as np
+
+try:
+    from field_extractors import FieldResult
+except ImportError:  # imported as part of the utils package
+    from utils.field_extractors import FieldResult
 
 
 class Validator:
@@ -27,86 +34,8 @@ class Validator:
         Returns:
             Validated and cleaned fields
         """
-        validated = {}
-        
-        # Validate Dealer Name
-        dealer = fields.get('dealer_name', {})
-        if isinstance(dealer, dict):
-            if dealer.get('confidence', 0) >= self.min_confidence:
-                validated['dealer_name'] = dealer.get('value')
-                validated['dealer_name_confidence'] = dealer.get('confidence')
-                validated['dealer_name_explanation'] = dealer.get('explanation')
-            else:
-                validated['dealer_name'] = None
-                validated['dealer_name_confidence'] = dealer.get('confidence', 0.0)
-                validated['dealer_name_explanation'] = dealer.get('explanation', 'Low confidence')
-        else:
-            validated['dealer_name'] = dealer
-            validated['dealer_name_confidence'] = 0.5
-            validated['dealer_name_explanation'] = 'Direct extraction'
-        
-        # Validate Model Name
-        model = fields.get('model_name', {})
-        if isinstance(model, dict):
-            if model.get('confidence', 0) >= self.min_confidence:
-                validated['model_name'] = model.get('value')
-                validated['model_name_confidence'] = model.get('confidence')
-                validated['model_name_explanation'] = model.get('explanation')
-            else:
-                validated['model_name'] = None
-                validated['model_name_confidence'] = model.get('confidence', 0.0)
-                validated['model_name_explanation'] = model.get('explanation', 'Low confidence')
-        else:
-            validated['model_name'] = model
-            validated['model_name_confidence'] = 0.5
-            validated['model_name_explanation'] = 'Direct extraction'
-        
-        # Validate Horse Power
-        hp = fields.get('horse_power', {})
-        if isinstance(hp, dict):
-            hp_value = hp.get('value')
-            if hp_value and self._validate_hp_range(hp_value):
-                validated['horse_power'] = int(hp_value)
-                validated['horse_power_confidence'] = hp.get('confidence')
-                validated['horse_power_explanation'] = hp.get('explanation')
-            else:
-                validated['horse_power'] = None
-                validated['horse_power_confidence'] = hp.get('confidence', 0.0)
-                validated['horse_power_explanation'] = hp.get('explanation', 'Invalid range or not found')
-        else:
-            hp_value = hp
-            if hp_value and self._validate_hp_range(hp_value):
-                validated['horse_power'] = int(hp_value)
-                validated['horse_power_confidence'] = 0.7
-                validated['horse_power_explanation'] = 'Direct extraction'
-            else:
-                validated['horse_power'] = None
-                validated['horse_power_confidence'] = 0.0
-                validated['horse_power_explanation'] = 'Invalid or not found'
-        
-        # Validate Asset Cost
-        cost = fields.get('asset_cost', {})
-        if isinstance(cost, dict):
-            cost_value = cost.get('value')
-            if cost_value and self._validate_cost_range(cost_value):
-                validated['asset_cost'] = float(cost_value)
-                validated['asset_cost_confidence'] = cost.get('confidence')
-                validated['asset_cost_explanation'] = cost.get('explanation')
-            else:
-                validated['asset_cost'] = None
-                validated['asset_cost_confidence'] = cost.get('confidence', 0.0)
-                validated['asset_cost_explanation'] = cost.get('explanation', 'Invalid range or not found')
-        else:
-            cost_value = cost
-            if cost_value and self._validate_cost_range(cost_value):
-                validated['asset_cost'] = float(cost_value)
-                validated['asset_cost_confidence'] = 0.7
-                validated['asset_cost_explanation'] = 'Direct extraction'
-            else:
-                validated['asset_cost'] = None
-                validated['asset_cost_confidence'] = 0.0
-                validated['asset_cost_explanation'] = 'Invalid or not found'
-        
+        validated = self._validate_scalar_fields(fields)
+
         # Validate Signature
         signature = fields.get('dealer_signature', {})
         validated['dealer_signature'] = {
@@ -114,7 +43,7 @@ class Validator:
             'bbox': self._validate_bbox(signature.get('bbox')),
             'confidence': signature.get('confidence', 0.0)
         }
-        
+
         # Validate Stamp
         stamp = fields.get('dealer_stamp', {})
         validated['dealer_stamp'] = {
@@ -122,7 +51,112 @@ class Validator:
             'bbox': self._validate_bbox(stamp.get('bbox')),
             'confidence': stamp.get('confidence', 0.0)
         }
-        
+
+        return validated
+
+    def validate_batch(self, all_fields: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Validate extracted fields for a whole batch of documents
+
+        Signature/stamp bounding boxes across the batch are stacked into
+        one (N, 4) array and checked in a single vectorized pass instead
+        of per-box Python branches.
+
+        Args:
+            all_fields: List of raw extracted-field dicts, one per document
+
+        Returns:
+            List of validated field dicts in the same order
+        """
+        detection_keys = ('dealer_signature', 'dealer_stamp')
+
+        # Collect every well-formed bbox with its (document, field) slot
+        slots = []
+        rows = []
+        for i, fields in enumerate(all_fields):
+            for key in detection_keys:
+                det = fields.get(key) or {}
+                bbox = det.get('bbox')
+                if isinstance(bbox, list) and len(bbox) == 4 and \
+                        all(isinstance(v, (int, float)) for v in bbox):
+                    slots.append((i, key))
+                    rows.append(bbox)
+
+        # One vectorized validity check over the whole batch
+        checked = {}
+        if rows:
+            arr = np.asarray(rows, dtype=np.float64)
+            ok = (arr[:, 0] >= 0) & (arr[:, 1] >= 0) & (arr[:, 2] > 0) & (arr[:, 3] > 0)
+            ints = arr.astype(np.int64)
+            for slot, row, good in zip(slots, ints, ok):
+                checked[slot] = [int(v) for v in row] if good else None
+
+        results = []
+        for i, fields in enumerate(all_fields):
+            validated = self._validate_scalar_fields(fields)
+            for key in detection_keys:
+                det = fields.get(key) or {}
+                validated[key] = {
+                    'present': det.get('present', False),
+                    'bbox': checked.get((i, key)),
+                    'confidence': det.get('confidence', 0.0)
+                }
+            results.append(validated)
+
+        return results
+
+    # (field name, range-check method name, cast, direct-extraction confidence);
+    # name fields are accepted on extractor confidence, numeric fields on
+    # their range check
+    _FIELD_SPEC = (
+        ('dealer_name', None, None, 0.5),
+        ('model_name', None, None, 0.5),
+        ('horse_power', '_validate_hp_range', int, 0.7),
+        ('asset_cost', '_validate_cost_range', float, 0.7),
+    )
+
+    def _validate_scalar_fields(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate the name/HP/cost fields (everything except detections)"""
+        validated = {}
+
+        for name, check_name, cast, direct_conf in self._FIELD_SPEC:
+            raw = fields.get(name, FieldResult(None, 0.0, 'Not extracted'))
+            check = getattr(self, check_name) if check_name else None
+
+            if isinstance(raw, dict):
+                # Legacy dict payloads (e.g. cached results) — normalize
+                raw = FieldResult(
+                    raw.get('value'),
+                    raw.get('confidence', 0.0),
+                    raw.get('explanation', '')
+                )
+
+            if isinstance(raw, FieldResult):
+                if check is None:
+                    accepted = raw.confidence >= self.min_confidence
+                    reject_note = 'Low confidence'
+                else:
+                    accepted = bool(raw.value) and check(raw.value)
+                    reject_note = 'Invalid range or not found'
+
+                if accepted:
+                    validated[name] = cast(raw.value) if cast else raw.value
+                    validated[f'{name}_confidence'] = raw.confidence
+                    validated[f'{name}_explanation'] = raw.explanation
+                else:
+                    validated[name] = None
+                    validated[f'{name}_confidence'] = raw.confidence
+                    validated[f'{name}_explanation'] = raw.explanation or reject_note
+
+            elif check is None or (raw and check(raw)):
+                validated[name] = cast(raw) if cast else raw
+                validated[f'{name}_confidence'] = direct_conf
+                validated[f'{name}_explanation'] = 'Direct extraction'
+            else:
+                validated[name] = None
+                validated[f'{name}_confidence'] = 0.0
+                validated[f'{name}_explanation'] = 'Invalid or not found'
+
         return validated
     
     def _validate_hp_range(self, hp_value: float) -> bool:
@@ -1,7 +1,13 @@
+import re
+
 import torch
 import numpy as np
-from typing import Dict, Any
-from PIL import Image
+from typing import Dict, Any, List
+
+try:
+    from pre_repr import PreprocessedDoc
+except ImportError:  # imported as part of the utils package
+    from utils.pre_repr import PreprocessedDoc
 
 try:
     from transformers import Qwen2VLForConditionalGeneration, AutoProcessor
@@ -9,42 +15,256 @@ except ImportError:
     print("Warning: transformers not installed. Run: pip install transformers")
 
 
+# One multiline pass over the response beats per-line startswith chains;
+# the parser table maps each schema key to its output field and converter
+_FIELD_RE = re.compile(
+    r'^(DEALER_NAME|MODEL_NAME|HORSE_POWER|ASSET_COST):\s*(.+?)\s*$',
+    re.MULTILINE
+)
+
+# Pull the numeric token out of whatever decoration the model emits
+# ("₹4,50,000", "Rs. 450000", "approx. 45 HP"). Searching for the number
+# is safer than stripping non-digits around it, which keeps stray dots
+# from abbreviations and silently corrupts the value ("Rs. 450000" would
+# become ".450000" and parse as 0.45)
+_NUM_RE = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+
+def _parse_number(value: str) -> float:
+    """Parse the first number in a VLM field value, ignoring commas"""
+    match = _NUM_RE.search(value)
+    if match is None:
+        raise ValueError(f"no number in {value!r}")
+    return float(match.group().replace(',', ''))
+
+
+_FIELD_PARSERS = {
+    'DEALER_NAME': ('dealer_name', None),
+    'MODEL_NAME': ('model_name', None),
+    'HORSE_POWER': ('horse_power', _parse_number),
+    'ASSET_COST': ('asset_cost', _parse_number),
+}
+
+
+def _model_dtype() -> 'torch.dtype':
+    """
+    Pick the widest-throughput dtype the hardware actually supports
+
+    The generate loop is memory-bandwidth-bound, so halving weight and
+    activation bytes with BF16 roughly halves latency on hardware with
+    native support. CPUs without AVX-512 BF16/AMX keep FP32 (emulated
+    BF16 is slower than not converting at all).
+    """
+    if torch.cuda.is_available():
+        return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+
+    capability = getattr(torch.backends.cpu, 'get_cpu_capability', lambda: '')()
+    if 'AVX512' in capability or 'AMX' in capability:
+        return torch.bfloat16
+    return torch.float32
+
+
+def _attn_implementation() -> str:
+    """
+    Pick the fastest available attention backend
+
+    FlashAttention-2 when the package and a CUDA device are present;
+    otherwise SDPA, whose fused kernel skips materializing the full
+    NxN attention mask the eager path builds — a real saving for the
+    vision tower, which attends over every image patch.
+    """
+    if torch.cuda.is_available():
+        try:
+            import flash_attn  # noqa: F401
+            return "flash_attention_2"
+        except ImportError:
+            pass
+    return "sdpa"
+
+
+def _quantization_kwargs() -> Dict[str, Any]:
+    """
+    from_pretrained kwargs for 8-bit weight quantization when available
+
+    INT8 weights halve the memory bandwidth the generate loop is bound
+    on and use integer matmul kernels. The vision tower is skipped so
+    image features keep full precision (quantizing it measurably hurts
+    OCR-adjacent accuracy). Requires bitsandbytes and a CUDA device;
+    returns {} otherwise so loading proceeds unquantized.
+    """
+    if not torch.cuda.is_available():
+        return {}
+    try:
+        import bitsandbytes  # noqa: F401
+        from transformers import BitsAndBytesConfig
+    except ImportError:
+        return {}
+
+    return {
+        'quantization_config': BitsAndBytesConfig(
+            load_in_8bit=True,
+            llm_int8_skip_modules=['visual']
+        ),
+        'device_map': 'auto'
+    }
+
+
 class VLMExtractor:
     
-    def __init__(self, model_name: str = "Qwen/Qwen2-VL-2B-Instruct"):
+    def __init__(self, model_name: str = "Qwen/Qwen2-VL-2B-Instruct",
+                 compile_model: bool = False):
         """
         Initialize VLM extractor
-        
+
         Args:
             model_name: HuggingFace model name
+            compile_model: Compile the forward pass with torch.compile
+                (one-off minute-scale warmup on first generate; pays off
+                on CPU where per-token dispatch overhead dominates)
         """
         self.model_name = model_name
         self.model = None
         self.processor = None
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        # The extraction prompt is constant, so its token ids only vary
+        # with the number of image placeholder tokens the processor
+        # expands (a function of the vision grid). Cache the tokenized
+        # ids per grid shape and skip re-tokenizing on later calls.
+        self._prompt = self._create_extraction_prompt()
+        self._prompt_cache: Dict[tuple, Any] = {}
         
         try:
             print(f"Loading VLM model: {model_name}...")
             
-            # Load processor
+            # Load processor with a pinned pixel budget: four short
+            # fields don't need native scan resolution, capping the
+            # visual tokens shrinks vision-tower FLOPs quadratically,
+            # and the narrow grid range keeps shapes stable for the
+            # static cache / compiled decode (and the prompt-id cache)
             self.processor = AutoProcessor.from_pretrained(
                 model_name,
+                min_pixels=256 * 28 * 28,
+                max_pixels=512 * 28 * 28,
                 trust_remote_code=True
             )
+
+            # Decoder-only generation needs left padding: with the
+            # default right padding, shorter prompts in a mixed batch
+            # get pad tokens between prompt and generation, silently
+            # corrupting their output. With left padding every row ends
+            # at the same position, so the outputs[:, prompt_len:] slice
+            # in extract_batch stays correct
+            self.processor.tokenizer.padding_side = 'left'
             
-            # Load model with quantization for CPU efficiency
+            # Load model, 8-bit quantized when bitsandbytes + CUDA are
+            # available (vision tower stays in full precision)
+            quant_kwargs = _quantization_kwargs()
+            model_kwargs = dict(
+                torch_dtype=_model_dtype(),
+                device_map=self.device,
+                trust_remote_code=True,
+                low_cpu_mem_usage=True,
+                attn_implementation=_attn_implementation()
+            )
+            model_kwargs.update(quant_kwargs)
             self.model = Qwen2VLForConditionalGeneration.from_pretrained(
                 model_name,
-                torch_dtype=torch.float32,
-                device_map="cpu",
-                trust_remote_code=True,
-                low_cpu_mem_usage=True
+                **model_kwargs
             )
             
+            # Pre-allocated static KV cache: decode steps write into a
+            # fixed buffer instead of growing (and re-allocating) the
+            # dynamic cache every token, and the static shapes make the
+            # decode step compilable
+            self.model.generation_config.cache_implementation = "static"
+
+            # Pure greedy decoding: neutral sampling knobs mean generate
+            # builds an empty logits-processor list, so no per-token
+            # repetition/top-k/top-p Python dispatch runs at all
+            gen_config = self.model.generation_config
+            gen_config.do_sample = False
+            gen_config.num_beams = 1
+            gen_config.repetition_penalty = 1.0
+            gen_config.temperature = 1.0
+            gen_config.top_p = 1.0
+            gen_config.top_k = None
+            gen_config.use_cache = True
+
+            if compile_model:
+                # Remove per-token Python dispatch from the decode loop.
+                # Only sound together with the static cache above —
+                # dynamic cache shapes would trigger recompile storms.
+                self.model.forward = torch.compile(
+                    self.model.forward,
+                    mode="reduce-overhead",
+                    fullgraph=False
+                )
+
+            # Warm the prompt-id cache now rather than on the first
+            # document: one processor pass over a dummy image at the
+            # pinned resolution captures the input_ids/attention_mask
+            # templates that _prepare_inputs reuses
+            try:
+                dummy = np.zeros((448, 448, 3), dtype=np.uint8)
+                self._prepare_inputs(dummy)
+            except Exception:
+                pass
+
             print("VLM model loaded successfully!")
             
         except Exception as e:
             print(f"Error loading VLM model: {e}")
             print("Will use OCR-only fallback mode")
+
+    def _prepare_inputs(self, image) -> Dict[str, Any]:
+        """
+        Build generate() inputs, reusing cached prompt token ids
+
+        Only the first image of each vision-grid shape pays for prompt
+        tokenization; afterwards just the image processor runs and the
+        cached input_ids/attention_mask are reused. Accepts a numpy HWC
+        array (or PIL image) as the processor does natively.
+        """
+        image_inputs = self.processor.image_processor(
+            images=image, return_tensors="pt"
+        )
+        grid = tuple(image_inputs['image_grid_thw'][0].tolist())
+
+        cached = self._prompt_cache.get(grid)
+        if cached is None:
+            full = self.processor(
+                text=self._prompt,
+                images=image,
+                return_tensors="pt"
+            )
+            self._prompt_cache[grid] = (full['input_ids'], full['attention_mask'])
+            return dict(full)
+
+        input_ids, attention_mask = cached
+        return {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+            **image_inputs
+        }
+
+    def _cast_inputs(self, inputs):
+        """
+        Match input tensors to the model's dtype and device
+
+        On CUDA, host tensors are staged through pinned memory so the
+        upload overlaps with compute instead of blocking on a pageable
+        copy.
+        """
+        dtype = self.model.dtype
+        out = {}
+        for k, v in inputs.items():
+            if torch.is_floating_point(v):
+                v = v.to(dtype)
+            if self.device == "cuda" and v.device.type == "cpu":
+                v = v.pin_memory().to(self.device, non_blocking=True)
+            out[k] = v
+        return out
     
     def extract(self, image: np.ndarray) -> Dict[str, Any]:
         """
@@ -60,32 +280,32 @@ class VLMExtractor:
             return self._fallback_extraction()
         
         try:
-            # Convert numpy array to PIL Image
-            pil_image = Image.fromarray(image)
-            
-            # Create prompt for field extraction
-            prompt = self._create_extraction_prompt()
-            
-            # Prepare inputs
-            inputs = self.processor(
-                text=prompt,
-                images=pil_image,
-                return_tensors="pt"
-            )
-            
+            # The image processor consumes numpy HWC directly, so no PIL
+            # round-trip (which copies the full image) is needed
+            if isinstance(image, PreprocessedDoc):
+                image = image.rgb
+
+            # Prepare inputs (prompt ids come from the per-grid cache)
+            inputs = self._cast_inputs(self._prepare_inputs(image))
+            prompt_len = inputs['input_ids'].shape[1]
+
             # Generate response
             with torch.no_grad():
                 outputs = self.model.generate(
                     **inputs,
-                    max_new_tokens=512,
+                    # Four short KEY: value lines fit well inside 96
+                    # tokens; every spare token is one wasted forward
+                    max_new_tokens=96,
                     do_sample=False
                 )
             
-            # Decode response
-            response = self.processor.batch_decode(
-                outputs,
+            # Decode only the generated tail: the prompt prefix (mostly
+            # thousands of image placeholder tokens) would be detokenized
+            # just to be thrown away by the parser
+            response = self.processor.tokenizer.decode(
+                outputs[0, prompt_len:],
                 skip_special_tokens=True
-            )[0]
+            )
             
             # Parse response to extract fields
             fields = self._parse_vlm_response(response)
@@ -96,6 +316,61 @@ class VLMExtractor:
             print(f"VLM extraction error: {e}")
             return self._fallback_extraction()
     
+    def extract_batch(self, images: List[np.ndarray]) -> List[Dict[str, Any]]:
+        """
+        Extract fields from a mini-batch of invoice images in one forward pass
+
+        Batching amortizes the model's weight bandwidth across documents, so
+        per-document decode cost drops roughly linearly until the device
+        saturates.
+
+        Args:
+            images: List of input images as numpy arrays
+
+        Returns:
+            List of extracted-field dictionaries, one per image
+        """
+        if self.model is None or self.processor is None:
+            return [self._fallback_extraction() for _ in images]
+
+        if len(images) == 1:
+            # No batching benefit for a single image; use the simple path
+            return [self.extract(images[0])]
+
+        try:
+            arrays = [
+                img.rgb if isinstance(img, PreprocessedDoc) else img
+                for img in images
+            ]
+            inputs = self._cast_inputs(self.processor(
+                text=[self._prompt] * len(images),
+                images=arrays,
+                return_tensors="pt",
+                padding=True
+            ))
+            prompt_len = inputs['input_ids'].shape[1]
+
+            with torch.no_grad():
+                outputs = self.model.generate(
+                    **inputs,
+                    # Four short KEY: value lines fit well inside 96
+                    # tokens; every spare token is one wasted forward
+                    max_new_tokens=96,
+                    do_sample=False
+                )
+
+            # Decode only the generated tails past the padded prompt
+            responses = self.processor.batch_decode(
+                outputs[:, prompt_len:],
+                skip_special_tokens=True
+            )
+
+            return [self._parse_vlm_response(r) for r in responses]
+
+        except Exception as e:
+            print(f"VLM batch extraction error: {e}")
+            return [self.extract(img) for img in images]
+
     def _create_extraction_prompt(self) -> str:
         """Create a structured prompt for field extraction"""
         prompt = """You are analyzing a tractor loan quotation/invoice document. Extract the following information:
@@ -133,38 +408,16 @@ If any field is not found, write "NOT_FOUND" for that field."""
             'vlm_raw_response': response
         }
         
-        # Parse response line by line
-        for line in response.split('\n'):
-            line = line.strip()
-            
-            if line.startswith('DEALER_NAME:'):
-                value = line.split(':', 1)[1].strip()
-                if value != 'NOT_FOUND':
-                    fields['dealer_name'] = value
-            
-            elif line.startswith('MODEL_NAME:'):
-                value = line.split(':', 1)[1].strip()
-                if value != 'NOT_FOUND':
-                    fields['model_name'] = value
-            
-            elif line.startswith('HORSE_POWER:'):
-                value = line.split(':', 1)[1].strip()
-                if value != 'NOT_FOUND':
-                    try:
-                        fields['horse_power'] = float(value)
-                    except:
-                        pass
-            
-            elif line.startswith('ASSET_COST:'):
-                value = line.split(':', 1)[1].strip()
-                if value != 'NOT_FOUND':
-                    try:
-                        # Remove commas and parse
-                        value = value.replace(',', '')
-                        fields['asset_cost'] = float(value)
-                    except:
-                        pass
-        
+        # One precompiled multiline scan pulls out every schema line
+        for key, value in _FIELD_RE.findall(response):
+            if value == 'NOT_FOUND':
+                continue
+            name, convert = _FIELD_PARSERS[key]
+            try:
+                fields[name] = convert(value) if convert else value
+            except ValueError:
+                pass
+
         return fields
     
     def _fallback_extraction(self) -> Dict[str, Any]: